@@ -1,12 +1,19 @@
 import os
+import hmac
 import logging
-from flask import Flask, render_template, request, flash, redirect, url_for, send_file
+from flask import Flask, render_template, request, flash, redirect, url_for, send_file, abort, Response, jsonify, stream_template
 from werkzeug.utils import secure_filename
 import tempfile
-import shutil
+from utils.admission import AdmissionController, AdmissionRejected
+from utils.artifact_store import ArtifactStore
 from utils.excel_processor import ExcelProcessor
+from utils.order_index import OrderIndex
+from utils.planner import WorkloadPlanner
+from utils.preview import PreviewCache
 from utils.word_processor import WordProcessor
-from utils.calculations import CalculationEngine
+from utils.calculations import CalculationEngine, format_brl
+from utils.profiling import RequestProfiler, list_profiles, get_profile_path
+from utils.single_flight import SingleFlight
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -19,6 +26,32 @@ UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXCEL_EXTENSIONS = {'xlsx'}
 ALLOWED_WORD_EXTENSIONS = {'docx'}
 MAX_FILE_SIZE = 16 * 1024 * 1024  # 16MB
+ARTIFACT_TTL_SECONDS = int(os.environ.get("ARTIFACT_TTL_SECONDS", 3600))  # 1 hour
+ARTIFACT_MAX_BYTES = int(os.environ.get("ARTIFACT_MAX_BYTES", 512 * 1024 * 1024))  # 512MB
+REPORT_ROWS_PER_TABLE = int(os.environ.get("REPORT_ROWS_PER_TABLE", 0))  # 0 = single table
+REPORT_SPLIT_BY_MONTH = os.environ.get("REPORT_SPLIT_BY_MONTH", "0") == "1"
+REPORT_SECTION_PER_CHUNK = os.environ.get("REPORT_SECTION_PER_CHUNK", "0") == "1"
+RENDER_PARALLEL_WORKERS = int(os.environ.get("RENDER_PARALLEL_WORKERS", 0))  # 0 = render in the request process
+RENDER_PARALLEL_MIN_ROWS = int(os.environ.get("RENDER_PARALLEL_MIN_ROWS", 2000))  # rows per table to go parallel
+ADMISSION_MAX_BYTES = int(os.environ.get("ADMISSION_MAX_BYTES", 64 * 1024 * 1024))  # 64MB of uploads in flight
+ADMISSION_MAX_ROWS = int(os.environ.get("ADMISSION_MAX_ROWS", 50000))  # extracted rows in flight
+ADMISSION_MAX_QUEUE = int(os.environ.get("ADMISSION_MAX_QUEUE", 8))  # waiting requests before 503
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get("ADMISSION_QUEUE_TIMEOUT", 60))  # seconds
+ADMISSION_RETRY_AFTER = int(os.environ.get("ADMISSION_RETRY_AFTER", 5))  # seconds
+ADMISSION_STATE_FILE = os.path.join(UPLOAD_FOLDER, '.admission.json')  # budget shared by all workers
+EXCEL_READER_ENGINE = os.environ.get("EXCEL_READER_ENGINE", "openpyxl")  # openpyxl or native
+PLANNER_MEMORY_BUDGET = int(os.environ.get("PLANNER_MEMORY_BUDGET", 256 * 1024 * 1024))  # 256MB per file
+PLANNER_STREAMING_MIN_ROWS = int(os.environ.get("PLANNER_STREAMING_MIN_ROWS", 5000))  # rows to switch to native reader
+SINGLE_FLIGHT_FOLDER = os.path.join(UPLOAD_FOLDER, '.single_flight')
+SINGLE_FLIGHT_RESULT_TTL = float(os.environ.get("SINGLE_FLIGHT_RESULT_TTL", 60))  # seconds a finished result is shared
+PREVIEW_FOLDER = os.path.join(UPLOAD_FOLDER, '.previews')
+PREVIEW_TTL_SECONDS = int(os.environ.get("PREVIEW_TTL_SECONDS", 900))  # 15 minutes to review and confirm
+PREVIEW_MAX_BYTES = int(os.environ.get("PREVIEW_MAX_BYTES", 256 * 1024 * 1024))  # 256MB
+PREVIEW_PAGE_SIZE = int(os.environ.get("PREVIEW_PAGE_SIZE", 50))  # rows per review page
+PROFILE_FOLDER = os.environ.get("PROFILE_FOLDER", "profiles")
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")  # empty = profiling disabled
+PROFILE_SAMPLE_INTERVAL = float(os.environ.get("PROFILE_SAMPLE_INTERVAL", 0.005))  # seconds
+PROFILE_MAX_COUNT = int(os.environ.get("PROFILE_MAX_COUNT", 50))  # older profiles are deleted
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
@@ -26,11 +59,56 @@ app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
 # Create upload folder if it doesn't exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# Generated files live in per-job directories that are evicted in the background
+artifact_store = ArtifactStore(UPLOAD_FOLDER, ttl_seconds=ARTIFACT_TTL_SECONDS, max_bytes=ARTIFACT_MAX_BYTES)
+artifact_store.start_sweeper()
+
+# Calculated rows kept for the review step until confirmed or expired
+preview_cache = PreviewCache(ArtifactStore(PREVIEW_FOLDER, ttl_seconds=PREVIEW_TTL_SECONDS,
+                                           max_bytes=PREVIEW_MAX_BYTES, sweep_interval=60),
+                             page_size=PREVIEW_PAGE_SIZE)
+preview_cache.store.start_sweeper()
+
+# Identical uploads in flight share one computation, also across gunicorn workers
+single_flight = SingleFlight(SINGLE_FLIGHT_FOLDER, result_ttl=SINGLE_FLIGHT_RESULT_TTL)
+
+# Limits concurrent processing across every worker process on this host
+admission_controller = AdmissionController(ADMISSION_MAX_BYTES, ADMISSION_MAX_ROWS,
+                                           max_queue=ADMISSION_MAX_QUEUE,
+                                           queue_timeout=ADMISSION_QUEUE_TIMEOUT,
+                                           retry_after=ADMISSION_RETRY_AFTER,
+                                           state_path=ADMISSION_STATE_FILE)
+
+# Picks reader engine and rendering mode per file from a cheap size estimate
+workload_planner = WorkloadPlanner(PLANNER_MEMORY_BUDGET, default_engine=EXCEL_READER_ENGINE,
+                                   streaming_min_rows=PLANNER_STREAMING_MIN_ROWS,
+                                   parallel_workers=RENDER_PARALLEL_WORKERS,
+                                   parallel_min_rows=RENDER_PARALLEL_MIN_ROWS)
+
 def allowed_file(filename, allowed_extensions):
     """Check if file has allowed extension"""
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in allowed_extensions
 
+def is_profile_authorized():
+    """Check the profiling token sent in the X-Profile-Token header or 'profile_token' query"""
+    if not PROFILE_TOKEN:
+        return False
+    token = request.headers.get('X-Profile-Token') or request.args.get('profile_token', '')
+    return hmac.compare_digest(token.encode(), PROFILE_TOKEN.encode())
+
+def profiling_requested():
+    """Check if this request asked for profiling and is allowed to"""
+    wants_profile = request.headers.get('X-Profile') == '1' or request.args.get('profile') == '1'
+    return wants_profile and is_profile_authorized()
+
+@app.template_filter('valor')
+def format_valor(value):
+    """Format a number like the Word report does (1.234,56)"""
+    if not isinstance(value, (int, float)):
+        return value if value is not None else ''
+    return format_brl(value)
+
 @app.route('/')
 def index():
     """Main page for file upload and processing"""
@@ -40,111 +118,381 @@ def index():
 def process_files():
     """Process uploaded Excel files using fixed Word template"""
     try:
-        # Check if Excel files were uploaded
-        if 'excel_files' not in request.files:
-            flash('Pelo menos um arquivo Excel é obrigatório', 'error')
+        excel_files = uploaded_excel_files()
+        if excel_files is None:
+            return redirect(url_for('index'))
+        
+        def compute():
+            # Wait for processing budget; reject fast when the queue is full
+            with admission_controller.admit(request.content_length or 0) as ticket:
+                if profiling_requested():
+                    return run_profiled_pipeline(excel_files, ticket)
+                return run_pipeline(excel_files, ticket)
+        
+        # Profiled requests always do their own work
+        if profiling_requested():
+            return send_result(compute())
+        
+        result = single_flight.do(upload_key(excel_files), compute,
+                                  validate=lambda shared: os.path.isfile(shared['path']))
+        return send_result(result)
+    
+    except AdmissionRejected as e:
+        return busy_response(e)
+    
+    except Exception as e:
+        app.logger.error(f"Erro durante processamento: {str(e)}")
+        flash(f'Erro durante o processamento: {str(e)}', 'error')
+        return redirect(url_for('index'))
+
+@app.route('/preview', methods=['POST'])
+def preview_files():
+    """Extract and calculate uploaded Excel files and show them for review"""
+    try:
+        excel_files = uploaded_excel_files()
+        if excel_files is None:
             return redirect(url_for('index'))
         
-        excel_files = request.files.getlist('excel_files')
+        with admission_controller.admit(request.content_length or 0) as ticket:
+            batch = prepare_batch(excel_files, ticket)
         
-        # Check if files are selected
-        if not excel_files or all(file.filename == '' for file in excel_files):
-            flash('Por favor, selecione pelo menos um arquivo Excel', 'error')
+        if not batch['files']:
+            flash('Nenhum arquivo foi processado com sucesso.', 'error')
             return redirect(url_for('index'))
         
-        # Validate file extensions
+        preview_key = preview_cache.save(batch)
+        return redirect(url_for('show_preview', preview_key=preview_key))
+    
+    except AdmissionRejected as e:
+        return busy_response(e)
+    
+    except Exception as e:
+        app.logger.error(f"Erro durante pré-visualização: {str(e)}")
+        flash(f'Erro durante o processamento: {str(e)}', 'error')
+        return redirect(url_for('index'))
+
+@app.route('/preview/<preview_key>')
+def show_preview(preview_key):
+    """Show one page of the calculated rows of a previewed batch"""
+    # Only the batch index and the requested page are read from disk
+    index = preview_cache.load_index(preview_key)
+    if index is None:
+        flash('A pré-visualização expirou. Envie os arquivos novamente.', 'error')
+        return redirect(url_for('index'))
+    
+    file_index = request.args.get('file', 0, type=int)
+    if not 0 <= file_index < len(index['files']):
+        abort(404)
+    
+    view = preview_cache.page(preview_key, index, file_index, request.args.get('page', 1, type=int))
+    if view is None:
+        flash('A pré-visualização expirou. Envie os arquivos novamente.', 'error')
+        return redirect(url_for('index'))
+    
+    # Rows are streamed to the browser as the table is rendered
+    return Response(stream_template('index.html',
+                                    preview=view,
+                                    preview_key=preview_key,
+                                    preview_files=index['files'],
+                                    preview_totals=index['totals'],
+                                    duplicate_count=len(index['duplicates'])))
+
+@app.route('/preview/<preview_key>/confirm', methods=['POST'])
+def confirm_preview(preview_key):
+    """Render the Word documents from the reviewed rows, without re-reading the upload"""
+    try:
+        batch = preview_cache.load(preview_key)
+        if batch is None:
+            flash('A pré-visualização expirou. Envie os arquivos novamente.', 'error')
+            return redirect(url_for('index'))
+        
+        def compute():
+            with admission_controller.admit(0) as ticket:
+                ticket.add_rows(batch['totals']['linhas'])
+                return render_batch(batch)
+        
+        # A double-clicked confirm reuses the first rendering
+        result = single_flight.do(preview_key, compute,
+                                  validate=lambda shared: os.path.isfile(shared['path']))
+        return send_result(result)
+    
+    except AdmissionRejected as e:
+        return busy_response(e)
+    
+    except Exception as e:
+        app.logger.error(f"Erro durante geração confirmada: {str(e)}")
+        flash(f'Erro durante o processamento: {str(e)}', 'error')
+        return redirect(url_for('index'))
+
+def uploaded_excel_files():
+    """Validate the uploaded Excel files, flashing the problem and returning None if invalid"""
+    # Check if Excel files were uploaded
+    if 'excel_files' not in request.files:
+        flash('Pelo menos um arquivo Excel é obrigatório', 'error')
+        return None
+    
+    excel_files = request.files.getlist('excel_files')
+    
+    # Check if files are selected
+    if not excel_files or all(file.filename == '' for file in excel_files):
+        flash('Por favor, selecione pelo menos um arquivo Excel', 'error')
+        return None
+    
+    # Validate file extensions
+    for excel_file in excel_files:
+        if excel_file.filename and not allowed_file(excel_file.filename, ALLOWED_EXCEL_EXTENSIONS):
+            flash(f'O arquivo {excel_file.filename} deve ter extensão .xlsx', 'error')
+            return None
+    
+    return excel_files
+
+def busy_response(e):
+    """503 response telling the client when to retry a rejected job"""
+    app.logger.warning(f"Processamento recusado: {str(e)}")
+    return Response('Servidor ocupado processando outros arquivos. Tente novamente em instantes.',
+                    status=503,
+                    headers={'Retry-After': str(e.retry_after)},
+                    mimetype='text/plain')
+
+def upload_key(excel_files):
+    """Hash the uploaded files and the settings that affect the output"""
+    parts = []
+    for excel_file in excel_files:
+        if not excel_file.filename:
+            continue
+        content = excel_file.stream.read()
+        excel_file.stream.seek(0)
+        parts.append((excel_file.filename, content))
+    
+    variant = f'{EXCEL_READER_ENGINE}|{REPORT_ROWS_PER_TABLE}|{REPORT_SPLIT_BY_MONTH}|{REPORT_SECTION_PER_CHUNK}'
+    return SingleFlight.content_key(parts, variant)
+
+def send_result(result):
+    """Send the file produced by the pipeline, or go back to the form if nothing was produced"""
+    if result is None:
+        return redirect(url_for('index'))
+    
+    response = send_file(result['path'], 
+                         as_attachment=True, 
+                         download_name=result['download_name'],
+                         conditional=True)
+    response.headers['X-Duplicate-Orders'] = str(result['duplicate_count'])
+    return response
+
+def run_pipeline(excel_files, ticket):
+    """
+    Extract, calculate and render every uploaded Excel file
+    
+    Returns a dict with the stored file 'path', its 'download_name' and the
+    'duplicate_count', or None if no file could be processed.
+    """
+    return render_batch(prepare_batch(excel_files, ticket))
+
+def prepare_batch(excel_files, ticket):
+    """
+    Extract and calculate every uploaded Excel file without rendering
+    
+    Returns a batch dict with one entry per readable file ('excel_filename',
+    'worksheet_name', calculated 'rows', planned 'render_workers' and
+    'totals'), the batch 'order_index' and the overall 'totals'.
+    """
+    # Create temporary directory for the uploaded workbooks
+    with tempfile.TemporaryDirectory() as temp_dir:
+        calc_engine = CalculationEngine()
+        
+        # Order numbers seen across every file in this upload
+        order_index = OrderIndex()
+        
+        files = []
+        
+        # Process each Excel file
         for excel_file in excel_files:
-            if excel_file.filename and not allowed_file(excel_file.filename, ALLOWED_EXCEL_EXTENSIONS):
-                flash(f'O arquivo {excel_file.filename} deve ter extensão .xlsx', 'error')
-                return redirect(url_for('index'))
-        
-        # Create temporary directory for processing
-        with tempfile.TemporaryDirectory() as temp_dir:
-            # Use fixed Word template from project
-            word_template_path = os.path.join('templates_word', 'modelo_padrao.docx')
+            if not excel_file.filename:
+                continue
+                
+            # Save uploaded Excel file
+            excel_filename = secure_filename(excel_file.filename)
+            excel_path = os.path.join(temp_dir, excel_filename)
+            excel_file.save(excel_path)
             
-            # Initialize processors
-            excel_processor = ExcelProcessor()
-            calc_engine = CalculationEngine()
-            word_processor = WordProcessor()
+            # Estimate the workload and pick reader engine and rendering mode
+            plan = workload_planner.plan(excel_path)
+            excel_processor = ExcelProcessor(engine=plan['reader_engine'])
             
-            processed_files = []
+            # Process Excel file - extract all rows
+            excel_result = excel_processor.extract_data(excel_path)
             
-            # Process each Excel file
-            for excel_file in excel_files:
-                if not excel_file.filename:
-                    continue
-                    
-                # Save uploaded Excel file
-                excel_filename = secure_filename(excel_file.filename)
-                excel_path = os.path.join(temp_dir, excel_filename)
-                excel_file.save(excel_path)
-                
-                # Process Excel file - extract all rows
-                excel_result = excel_processor.extract_data(excel_path)
-                
-                if not excel_result:
-                    flash(f'Erro ao processar arquivo {excel_filename}. Verifique se o arquivo possui dados nas colunas A, B, D, E, F, G a partir da linha 4.', 'warning')
-                    continue
-                
-                # Get worksheet name and data
-                excel_data_list = excel_result.get('data', [])
-                worksheet_name = excel_result.get('worksheet_name', 'Planilha')
-                
-                # Process all rows with calculations
-                calculated_data_list = []
-                for row_data in excel_data_list:
-                    calculated_row = calc_engine.process_row(row_data)
-                    calculated_data_list.append(calculated_row)
-                
-                # Process Word file with all calculated data and worksheet name
-                output_filename = f'resultado_{excel_filename.replace(".xlsx", ".docx")}'
-                output_path = os.path.join(temp_dir, output_filename)
-                
-                success = word_processor.fill_template(word_template_path, calculated_data_list, output_path, worksheet_name)
-                
-                if success:
-                    # Copy output file to uploads folder
-                    final_output_path = os.path.join(app.config['UPLOAD_FOLDER'], output_filename)
-                    shutil.copy2(output_path, final_output_path)
-                    processed_files.append((output_filename, final_output_path))
-                else:
-                    flash(f'Erro ao processar arquivo Word para {excel_filename}.', 'warning')
+            if not excel_result:
+                flash(f'Erro ao processar arquivo {excel_filename}. Verifique se a planilha tem uma linha de cabeçalho com Data, Nº Pedido, Nome cliente, Prazo, Valor Pedido, Frete + Prazo e % Comissão, ou dados nas colunas A, B, D, E, F, G e I a partir da linha 4.', 'warning')
+                continue
             
-            # Check if any files were processed successfully
-            if not processed_files:
-                flash('Nenhum arquivo foi processado com sucesso.', 'error')
-                return redirect(url_for('index'))
+            # Get worksheet name and data
+            excel_data_list = excel_result.get('data', [])
+            worksheet_name = excel_result.get('worksheet_name', 'Planilha')
+            ticket.add_rows(len(excel_data_list))
             
-            # If only one file was processed, download it directly
-            if len(processed_files) == 1:
-                flash('Arquivo processado com sucesso!', 'success')
-                return send_file(processed_files[0][1], 
-                               as_attachment=True, 
-                               download_name=processed_files[0][0])
+            # Process all rows with calculations, flagging repeated order numbers
+            calculated_data_list = []
+            for row_data in excel_data_list:
+                order_index.add(row_data.get('numero_pedido'), excel_filename,
+                                row_data.get('row_number'), row_data.get('valor_pedido'))
+                calculated_row = calc_engine.process_row(row_data)
+                calculated_data_list.append(calculated_row)
             
-            # If multiple files were processed, create a ZIP file
-            import zipfile
-            zip_filename = f'resultados_{len(processed_files)}_arquivos.zip'
-            zip_path = os.path.join(temp_dir, zip_filename)
+            files.append({
+                'excel_filename': excel_filename,
+                'worksheet_name': worksheet_name,
+                'rows': calculated_data_list,
+                'render_workers': plan['render_workers'],
+                'totals': PreviewCache.totals(calculated_data_list),
+            })
+    
+    return {
+        'files': files,
+        'order_index': order_index,
+        'totals': PreviewCache.totals([row for entry in files for row in entry['rows']]),
+    }
+
+def render_batch(batch):
+    """
+    Render the Word documents of a prepared batch and store the results
+    
+    Returns the same dict as run_pipeline, or None if no file was rendered.
+    """
+    # Create temporary directory for processing
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # Use fixed Word template from project
+        word_template_path = os.path.join('templates_word', 'modelo_padrao.docx')
+        
+        order_index = batch['order_index']
+        processed_files = []
+        job_key = artifact_store.new_job()
+        
+        for entry in batch['files']:
+            excel_filename = entry['excel_filename']
+            word_processor = WordProcessor(parallel_workers=entry['render_workers'],
+                                           parallel_min_rows=RENDER_PARALLEL_MIN_ROWS)
             
-            with zipfile.ZipFile(zip_path, 'w') as zip_file:
-                for filename, filepath in processed_files:
-                    zip_file.write(filepath, filename)
+            # Process Word file with all calculated data and worksheet name
+            output_filename = f'resultado_{excel_filename.replace(".xlsx", ".docx")}'
+            output_path = os.path.join(temp_dir, output_filename)
             
-            # Copy ZIP to uploads folder
-            final_zip_path = os.path.join(app.config['UPLOAD_FOLDER'], zip_filename)
-            shutil.copy2(zip_path, final_zip_path)
+            success = word_processor.fill_template(word_template_path, entry['rows'], output_path,
+                                                   entry['worksheet_name'],
+                                                   rows_per_table=REPORT_ROWS_PER_TABLE,
+                                                   split_by_month=REPORT_SPLIT_BY_MONTH,
+                                                   section_per_chunk=REPORT_SECTION_PER_CHUNK)
             
-            flash(f'{len(processed_files)} arquivos processados com sucesso!', 'success')
-            return send_file(final_zip_path, 
-                           as_attachment=True, 
-                           download_name=zip_filename)
+            if success:
+                # Store output file under this job's key
+                final_output_path = artifact_store.save(job_key, output_path, output_filename)
+                processed_files.append((output_filename, final_output_path))
+            else:
+                flash(f'Erro ao processar arquivo Word para {excel_filename}.', 'warning')
+        
+        # Check if any files were processed successfully
+        if not processed_files:
+            flash('Nenhum arquivo foi processado com sucesso.', 'error')
+            return None
+        
+        # Report orders that appear more than once so commission isn't paid twice
+        report_files = []
+        duplicate_count = len(order_index.duplicates)
+        if duplicate_count:
+            report_filename = 'pedidos_duplicados.csv'
+            report_path = os.path.join(temp_dir, report_filename)
+            order_index.write_csv(report_path)
+            report_files.append((report_filename, artifact_store.save(job_key, report_path, report_filename)))
+            flash(f'Atenção: {duplicate_count} pedido(s) duplicado(s) encontrado(s). Veja {report_filename}.', 'warning')
+        
+        # If only one file was processed, download it directly
+        if len(processed_files) == 1 and not report_files:
+            flash('Arquivo processado com sucesso!', 'success')
+            return {
+                'path': processed_files[0][1],
+                'download_name': processed_files[0][0],
+                'duplicate_count': duplicate_count,
+            }
+        
+        # If multiple files were processed (or there is a duplicate report), create a ZIP file
+        import zipfile
+        zip_filename = f'resultados_{len(processed_files)}_arquivos.zip'
+        zip_path = os.path.join(temp_dir, zip_filename)
+        
+        with zipfile.ZipFile(zip_path, 'w') as zip_file:
+            for filename, filepath in processed_files + report_files:
+                zip_file.write(filepath, filename)
+        
+        # Store ZIP under this job's key
+        final_zip_path = artifact_store.save(job_key, zip_path, zip_filename)
+        
+        flash(f'{len(processed_files)} arquivos processados com sucesso!', 'success')
+        return {
+            'path': final_zip_path,
+            'download_name': zip_filename,
+            'duplicate_count': duplicate_count,
+        }
+
+def run_profiled_pipeline(excel_files, ticket):
+    """Run the pipeline under the sampling profiler and save the profile"""
+    profiler = RequestProfiler(sample_interval=PROFILE_SAMPLE_INTERVAL, max_profiles=PROFILE_MAX_COUNT)
+    if not profiler.start():
+        return run_pipeline(excel_files, ticket)
     
-    except Exception as e:
-        app.logger.error(f"Erro durante processamento: {str(e)}")
-        flash(f'Erro durante o processamento: {str(e)}', 'error')
-        return redirect(url_for('index'))
+    try:
+        return run_pipeline(excel_files, ticket)
+    finally:
+        profiler.stop()
+        profile_name = profiler.save(PROFILE_FOLDER, {
+            'rows': ticket.rows,
+            'files': sum(1 for excel_file in excel_files if excel_file.filename),
+            'upload_bytes': ticket.cost_bytes,
+        })
+        app.logger.info(f"Perfil salvo: {profile_name}")
+
+@app.route('/download/<job_key>/<filename>')
+def download_file(job_key, filename):
+    """Download a previously generated file while it is still stored"""
+    file_path = artifact_store.get_path(job_key, filename)
+    if not file_path:
+        abort(404)
+    
+    return send_file(file_path, 
+                   as_attachment=True, 
+                   download_name=filename,
+                   conditional=True)
+
+@app.route('/admin/profiles')
+def admin_profiles():
+    """List saved request profiles"""
+    if not is_profile_authorized():
+        abort(403)
+    
+    return jsonify(list_profiles(PROFILE_FOLDER))
+
+@app.route('/admin/profiles/<name>.<extension>')
+def admin_profile_file(name, extension):
+    """Download a saved profile (.folded stacks or .json metadata)"""
+    if not is_profile_authorized():
+        abort(403)
+    
+    file_path = get_profile_path(PROFILE_FOLDER, name, extension)
+    if not file_path:
+        abort(404)
+    
+    return send_file(file_path, as_attachment=True, download_name=f'{name}.{extension}')
+
+@app.route('/admin/metrics')
+def admin_metrics():
+    """Planner decisions and admission state of this worker process"""
+    if not is_profile_authorized():
+        abort(403)
+    
+    return jsonify({
+        'pid': os.getpid(),
+        'planner': workload_planner.metrics(),
+        'admission': admission_controller.stats(),
+    })
 
 @app.errorhandler(413)
 def too_large(e):
@@ -0,0 +1,325 @@
+"""
+Local load test for the /process endpoint running under gunicorn
+
+Starts the app with the given worker/thread settings, fires concurrent
+multipart uploads of generated workbooks and reports throughput, latency
+percentiles, error/timeout rates and peak RSS per worker. Everything runs
+on localhost, no network access is needed.
+
+Example:
+    python scripts/load_test.py --workers 2 --threads 4 --concurrency 8 --requests 40 --rows 50,500,2000
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
+
+from openpyxl import Workbook
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEADERS = ['Data', 'Nº Pedido', 'Nº Romaneio', 'Nome cliente', 'Prazo', 'Valor Pedido',
+           'Frete + Prazo', 'Ref. Comissao', '% Comissão']
+PRAZOS = ['30', '30/60', '30/45', '30/60/90', '30/60/90/120', '28/56/84/112']
+
+
+def generate_workbook(path: str, rows: int, seed: int = 0) -> None:
+    """
+    Generate a workbook in the commission layout (header on row 3, data from row 4)
+
+    Args:
+        path: Where to save the workbook
+        rows: Number of data rows
+        seed: Random seed so runs are repeatable
+    """
+    rng = random.Random(seed)
+    workbook = Workbook()
+    worksheet = workbook.active
+    worksheet.title = f'Vendedor {rows}'
+    worksheet['D1'] = f'Pedidos Vendedor {rows} - Comissão 5%'
+
+    for col, header in enumerate(HEADERS, start=1):
+        worksheet.cell(row=3, column=col, value=header)
+
+    start_date = datetime(2025, 4, 1)
+    for i in range(rows):
+        row = 4 + i
+        worksheet.cell(row=row, column=1, value=start_date + timedelta(days=i % 60))
+        worksheet.cell(row=row, column=2, value=str(20000 + i))
+        worksheet.cell(row=row, column=3, value=str(70000 + i))
+        worksheet.cell(row=row, column=4, value=f'CIDADE {i % 40} - CLIENTE {i}')
+        worksheet.cell(row=row, column=5, value=rng.choice(PRAZOS))
+        worksheet.cell(row=row, column=6, value=round(rng.uniform(500, 30000), 2))
+        worksheet.cell(row=row, column=7, value=rng.choice([-3, -5, -7]))
+        worksheet.cell(row=row, column=9, value=0.05)
+
+    workbook.save(path)
+
+
+def encode_multipart(field_name: str, file_name: str, content: bytes):
+    """
+    Build a multipart/form-data body with a single file field
+
+    Returns:
+        Tuple of (body bytes, content type header)
+    """
+    boundary = uuid.uuid4().hex
+    body = (
+        f'--{boundary}\r\n'
+        f'Content-Disposition: form-data; name="{field_name}"; filename="{file_name}"\r\n'
+        f'Content-Type: application/vnd.openxmlformats-officedocument.spreadsheetml.sheet\r\n\r\n'
+    ).encode() + content + f'\r\n--{boundary}--\r\n'.encode()
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+def free_port() -> int:
+    """Find a free TCP port on localhost"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int, workers: int, threads: int, worker_class: str, timeout: int, log_path: str) -> subprocess.Popen:
+    """Start gunicorn serving main:app and wait until it answers"""
+    command = [
+        sys.executable, '-m', 'gunicorn',
+        '--bind', f'127.0.0.1:{port}',
+        '--workers', str(workers),
+        '--threads', str(threads),
+        '--worker-class', worker_class,
+        '--timeout', str(timeout),
+        'main:app',
+    ]
+    log_file = open(log_path, 'w')
+    process = subprocess.Popen(command, cwd=PROJECT_ROOT, stdout=log_file, stderr=subprocess.STDOUT)
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'gunicorn exited early, see {log_path}')
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=1).read()
+            return process
+        except (urllib.error.URLError, ConnectionError, socket.timeout):
+            time.sleep(0.2)
+
+    process.terminate()
+    raise RuntimeError(f'gunicorn did not start in time, see {log_path}')
+
+
+def worker_pids(master_pid: int) -> List[int]:
+    """List gunicorn worker processes (children of the master) using /proc"""
+    pids = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as stat_file:
+                # The parent pid is the 2nd field after the ")" closing the command name
+                parent_pid = int(stat_file.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if parent_pid == master_pid:
+            pids.append(int(entry))
+    return pids
+
+
+def peak_rss_kb(pid: int) -> Optional[int]:
+    """Read the peak resident set size (VmHWM) of a process in kB"""
+    try:
+        with open(f'/proc/{pid}/status') as status_file:
+            for line in status_file:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+class RssMonitor:
+    """Polls peak RSS of every gunicorn worker while the test runs"""
+
+    def __init__(self, master_pid: int, interval: float = 0.5):
+        self.master_pid = master_pid
+        self.interval = interval
+        self.peaks: Dict[int, int] = {}
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self._thread.join()
+        self._poll()
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            self._poll()
+
+    def _poll(self) -> None:
+        if not os.path.isdir('/proc'):
+            return
+        for pid in worker_pids(self.master_pid):
+            rss = peak_rss_kb(pid)
+            if rss is not None:
+                self.peaks[pid] = max(self.peaks.get(pid, 0), rss)
+
+
+def send_upload(url: str, body: bytes, content_type: str, timeout: float) -> Dict[str, Any]:
+    """Send one upload and time it"""
+    request = urllib.request.Request(url, data=body, method='POST', headers={'Content-Type': content_type})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            status = response.status
+            # Processing failures redirect back to the form instead of sending a file
+            is_download = 'attachment' in response.headers.get('Content-Disposition', '')
+        outcome = 'ok' if status == 200 and is_download else 'error'
+    except urllib.error.HTTPError as e:
+        status = e.code
+        outcome = 'rejected' if e.code == 503 else 'error'
+    except (socket.timeout, TimeoutError):
+        status = None
+        outcome = 'timeout'
+    except (urllib.error.URLError, ConnectionError) as e:
+        status = None
+        outcome = 'timeout' if isinstance(getattr(e, 'reason', None), socket.timeout) else 'error'
+    return {'status': status, 'outcome': outcome, 'latency': time.perf_counter() - start}
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(results: List[Dict[str, Any]], elapsed: float) -> Dict[str, Any]:
+    """Aggregate request results into throughput, latency and error figures"""
+    total = len(results)
+    latencies = [r['latency'] for r in results if r['outcome'] == 'ok']
+    counts = {outcome: sum(1 for r in results if r['outcome'] == outcome)
+              for outcome in ('ok', 'rejected', 'error', 'timeout')}
+    return {
+        'requests': total,
+        'elapsed_seconds': round(elapsed, 3),
+        'throughput_rps': round(counts['ok'] / elapsed, 3) if elapsed else 0,
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'p99': percentile(latencies, 99),
+        'error_rate': counts['error'] / total if total else 0,
+        'rejected_rate': counts['rejected'] / total if total else 0,
+        'timeout_rate': counts['timeout'] / total if total else 0,
+        'counts': counts,
+    }
+
+
+def format_seconds(value: Optional[float]) -> str:
+    return f'{value:.3f}s' if value is not None else '-'
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Concurrent load test for /process under gunicorn')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=1, help='threads per gunicorn worker')
+    parser.add_argument('--worker-class', default='sync', help='gunicorn worker class (sync, gthread)')
+    parser.add_argument('--server-timeout', type=int, default=120, help='gunicorn worker timeout in seconds')
+    parser.add_argument('--concurrency', type=int, default=8, help='simultaneous uploads')
+    parser.add_argument('--requests', type=int, default=40, help='total uploads per workbook size')
+    parser.add_argument('--rows', default='50,500,2000', help='comma separated workbook sizes (rows)')
+    parser.add_argument('--timeout', type=float, default=120, help='client timeout per request in seconds')
+    parser.add_argument('--identical', action='store_true',
+                        help='send byte-identical uploads (measures single-flight coalescing)')
+    parser.add_argument('--json', dest='json_path', help='also write the report to this JSON file')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.rows.split(',') if size.strip()]
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        uploads = {}
+        for size in sizes:
+            path = os.path.join(temp_dir, f'vendedor_{size}.xlsx')
+            generate_workbook(path, size, seed=size)
+            with open(path, 'rb') as workbook_file:
+                uploads[size] = workbook_file.read()
+
+        port = free_port()
+        log_path = os.path.join(temp_dir, 'gunicorn.log')
+        server = start_server(port, args.workers, args.threads, args.worker_class, args.server_timeout, log_path)
+        monitor = RssMonitor(server.pid)
+        monitor.start()
+
+        report = {
+            'config': {
+                'workers': args.workers, 'threads': args.threads, 'worker_class': args.worker_class,
+                'concurrency': args.concurrency, 'requests': args.requests,
+            },
+            'sizes': {},
+        }
+
+        try:
+            url = f'http://127.0.0.1:{port}/process'
+            for size in sizes:
+                # Distinct file names keep the server from coalescing identical uploads
+                bodies = [
+                    encode_multipart('excel_files',
+                                     f'vendedor_{size}.xlsx' if args.identical else f'vendedor_{size}_{i}.xlsx',
+                                     uploads[size])
+                    for i in range(args.requests)
+                ]
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+                    results = list(pool.map(lambda body: send_upload(url, body[0], body[1], args.timeout), bodies))
+                report['sizes'][size] = summarize(results, time.perf_counter() - start)
+        finally:
+            monitor.stop()
+            server.send_signal(signal.SIGTERM)
+            try:
+                server.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+        report['peak_rss_mb_per_worker'] = {pid: round(kb / 1024, 1) for pid, kb in monitor.peaks.items()}
+
+    print(f"gunicorn: {args.workers} workers x {args.threads} threads ({args.worker_class}), "
+          f"concurrency {args.concurrency}, {args.requests} requests per size")
+    print(f"{'rows':>8} {'req/s':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'errors':>7} {'503':>7} {'timeouts':>9}")
+    for size, stats in report['sizes'].items():
+        print(f"{size:>8} {stats['throughput_rps']:>8.2f} {format_seconds(stats['p50']):>9} "
+              f"{format_seconds(stats['p95']):>9} {format_seconds(stats['p99']):>9} "
+              f"{stats['error_rate']:>7.1%} {stats['rejected_rate']:>7.1%} {stats['timeout_rate']:>9.1%}")
+    if report['peak_rss_mb_per_worker']:
+        peaks = ', '.join(f'{pid}: {mb} MB' for pid, mb in sorted(report['peak_rss_mb_per_worker'].items()))
+        print(f"peak RSS per worker: {peaks}")
+    else:
+        print("peak RSS per worker: not available (/proc not found)")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as json_file:
+            json.dump(report, json_file, indent=2)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""
+Tests for the admission controller queue and the 503 responses of /process
+"""
+
+import io
+import threading
+import time
+
+import pytest
+
+from utils.admission import AdmissionController, AdmissionRejected
+
+
+@pytest.fixture(params=['local', 'shared'])
+def make_controller(request, tmp_path):
+    """Build controllers with the per-process state and with the shared state file"""
+    def make(**kwargs):
+        if request.param == 'shared':
+            kwargs['state_path'] = str(tmp_path / 'admission.json')
+        return AdmissionController(**kwargs)
+    return make
+
+
+def hold(controller, started, release, cost_bytes=10):
+    """Admit one job and keep it active until release is set"""
+    with controller.admit(cost_bytes):
+        started.set()
+        release.wait(5)
+
+
+def wait_for_queue(controller, queued):
+    """Block until the controller has the given number of waiting jobs"""
+    deadline = time.monotonic() + 5
+    while controller.stats()['queued'] < queued:
+        assert time.monotonic() < deadline, "jobs did not reach the queue"
+        time.sleep(0.01)
+
+
+def test_jobs_are_admitted_in_arrival_order(make_controller):
+    controller = make_controller(max_bytes=10, max_rows=1000, max_queue=8, queue_timeout=5)
+    started, release = threading.Event(), threading.Event()
+    holder = threading.Thread(target=hold, args=(controller, started, release))
+    holder.start()
+    started.wait(5)
+
+    order = []
+
+    def job(name):
+        with controller.admit(10):
+            order.append(name)
+
+    waiters = []
+    for index, name in enumerate(['first', 'second', 'third']):
+        waiter = threading.Thread(target=job, args=(name,))
+        waiter.start()
+        wait_for_queue(controller, index + 1)
+        waiters.append(waiter)
+
+    release.set()
+    holder.join(5)
+    for waiter in waiters:
+        waiter.join(5)
+
+    assert order == ['first', 'second', 'third']
+    assert controller.stats()['active'] == 0
+
+
+def test_job_within_budget_is_admitted_alongside(make_controller):
+    controller = make_controller(max_bytes=100, max_rows=1000, queue_timeout=1)
+    with controller.admit(10) as first:
+        first.add_rows(5)
+        with controller.admit(10):
+            stats = controller.stats()
+            assert stats['active'] == 2
+            assert stats['bytes_in_flight'] == 20
+            assert stats['rows_in_flight'] == 5
+
+
+def test_full_queue_rejects_immediately(make_controller):
+    controller = make_controller(max_bytes=10, max_rows=1000, max_queue=1, queue_timeout=5, retry_after=7)
+    started, release = threading.Event(), threading.Event()
+    holder = threading.Thread(target=hold, args=(controller, started, release))
+    holder.start()
+    started.wait(5)
+
+    queued = threading.Thread(target=hold, args=(controller, threading.Event(), release))
+    queued.start()
+    wait_for_queue(controller, 1)
+
+    begin = time.monotonic()
+    with pytest.raises(AdmissionRejected) as rejected:
+        with controller.admit(10):
+            pass
+    assert time.monotonic() - begin < 1
+    assert rejected.value.retry_after == 7
+
+    release.set()
+    holder.join(5)
+    queued.join(5)
+    stats = controller.stats()
+    assert (stats['active'], stats['queued']) == (0, 0)
+
+
+def test_wait_times_out(make_controller):
+    controller = make_controller(max_bytes=10, max_rows=1000, max_queue=4, queue_timeout=0.3)
+    started, release = threading.Event(), threading.Event()
+    holder = threading.Thread(target=hold, args=(controller, started, release))
+    holder.start()
+    started.wait(5)
+
+    with pytest.raises(AdmissionRejected):
+        with controller.admit(10):
+            pass
+    assert controller.stats()['queued'] == 0
+
+    release.set()
+    holder.join(5)
+
+
+def test_shared_state_is_seen_by_other_controllers(tmp_path):
+    state_path = str(tmp_path / 'admission.json')
+    worker_a = AdmissionController(max_bytes=10, max_rows=1000, max_queue=1, queue_timeout=0.3,
+                                   state_path=state_path)
+    worker_b = AdmissionController(max_bytes=10, max_rows=1000, max_queue=1, queue_timeout=0.3,
+                                   state_path=state_path)
+    with worker_a.admit(10):
+        assert worker_b.stats()['active'] == 1
+        with pytest.raises(AdmissionRejected):
+            with worker_b.admit(10):
+                pass
+    assert worker_b.stats()['active'] == 0
+
+
+def test_process_answers_503_with_retry_after(monkeypatch, tmp_path):
+    import app as app_module
+
+    controller = AdmissionController(max_bytes=10, max_rows=1000, max_queue=1, queue_timeout=0.3,
+                                     retry_after=9)
+    monkeypatch.setattr(app_module, 'admission_controller', controller)
+    monkeypatch.setattr(app_module, 'single_flight',
+                        app_module.SingleFlight(str(tmp_path / 'single_flight')))
+
+    started, release = threading.Event(), threading.Event()
+    holder = threading.Thread(target=hold, args=(controller, started, release))
+    holder.start()
+    started.wait(5)
+    try:
+        client = app_module.app.test_client()
+        response = client.post('/process', data={'excel_files': (io.BytesIO(b'planilha'), 'planilha.xlsx')},
+                               content_type='multipart/form-data')
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '9'
+    finally:
+        release.set()
+        holder.join(5)
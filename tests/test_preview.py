@@ -0,0 +1,68 @@
+"""
+Tests for the paged storage of previewed batches
+"""
+
+import os
+
+import pytest
+
+from utils.artifact_store import ArtifactStore
+from utils.order_index import OrderIndex
+from utils.preview import PreviewCache
+
+
+def make_batch():
+    """Batch with two files of 7 and 2 rows and one duplicate order"""
+    order_index = OrderIndex()
+    files = []
+    for name, count in (('JOAO.xlsx', 7), ('MARIA.xlsx', 2)):
+        rows = [{'numero_pedido': str(1000 + i), 'valor_pedido': 100.0 + i, 'valor_comissao': 10.0,
+                 'referencia_comissao': 5.0} for i in range(count)]
+        for i, row in enumerate(rows):
+            order_index.add(row['numero_pedido'], name, i + 4, row['valor_pedido'])
+        files.append({'excel_filename': name, 'worksheet_name': name[:-5], 'rows': rows,
+                      'render_workers': 0, 'totals': PreviewCache.totals(rows)})
+    return {'files': files, 'order_index': order_index,
+            'totals': PreviewCache.totals([row for entry in files for row in entry['rows']])}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """Preview cache with three rows per page"""
+    return PreviewCache(ArtifactStore(str(tmp_path)), page_size=3)
+
+
+def test_load_returns_every_row(cache):
+    batch = make_batch()
+    preview_key = cache.save(batch)
+
+    loaded = cache.load(preview_key)
+    assert [entry['rows'] for entry in loaded['files']] == [entry['rows'] for entry in batch['files']]
+    assert loaded['totals'] == batch['totals']
+    assert loaded['order_index'].duplicates == batch['order_index'].duplicates
+    assert 'pages' not in loaded['files'][0]
+
+
+def test_page_reads_only_the_index_and_its_rows(cache, monkeypatch):
+    preview_key = cache.save(make_batch())
+    read = []
+    read_part = cache._read_part
+    monkeypatch.setattr(cache, '_read_part', lambda key, filename: read.append(filename) or read_part(key, filename))
+
+    index = cache.load_index(preview_key)
+    view = cache.page(preview_key, index, 0, 3)
+
+    assert read == ['index.json', 'file0_page3.json']
+    assert [row['numero_pedido'] for row in view['rows']] == ['1006']
+    assert (view['page'], view['pages'], view['first_row']) == (3, 3, 7)
+    assert cache.page(preview_key, index, 1, 99)['page'] == 1
+    assert cache.page(preview_key, index, 2, 1) is None
+
+
+def test_missing_page_makes_the_batch_unavailable(cache):
+    preview_key = cache.save(make_batch())
+    os.remove(cache.store.get_path(preview_key, 'file0_page2.json'))
+
+    assert cache.load(preview_key) is None
+    assert cache.load_index(preview_key) is not None
+    assert cache.load('0' * 32) is None
@@ -0,0 +1,143 @@
+"""
+Tests for coalescing identical jobs with SingleFlight
+"""
+
+import logging
+import os
+import threading
+import time
+
+import pytest
+
+from utils.single_flight import SingleFlight
+
+KEY = SingleFlight.content_key([('planilha.xlsx', b'conteudo')])
+
+
+def wait_for_follower(caplog):
+    """Block until a caller logged that it is waiting for the in-flight job"""
+    deadline = time.monotonic() + 5
+    while not any('Waiting for in-flight job' in record.getMessage() for record in caplog.records):
+        assert time.monotonic() < deadline, "second caller did not wait for the first"
+        time.sleep(0.01)
+
+
+def run_in_thread(target, results, name):
+    """Start a thread storing target's return value or exception under name"""
+    def run():
+        try:
+            results[name] = target()
+        except Exception as e:
+            results[name] = e
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def test_concurrent_callers_compute_once(tmp_path, caplog):
+    caplog.set_level(logging.INFO, logger='utils.single_flight')
+    flight = SingleFlight(str(tmp_path))
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(threading.current_thread().name)
+        started.set()
+        release.wait(5)
+        return {'zip': 'comissoes.zip'}
+
+    results = {}
+    leader = run_in_thread(lambda: flight.do(KEY, compute), results, 'leader')
+    started.wait(5)
+    follower = run_in_thread(lambda: flight.do(KEY, compute), results, 'follower')
+    wait_for_follower(caplog)
+
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert len(calls) == 1
+    assert results['leader'] == results['follower'] == {'zip': 'comissoes.zip'}
+
+
+def test_instances_sharing_state_dir_reuse_result(tmp_path):
+    worker_a = SingleFlight(str(tmp_path))
+    worker_b = SingleFlight(str(tmp_path))
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def compute():
+        calls.append('a')
+        started.set()
+        release.wait(5)
+        return {'zip': 'comissoes.zip'}
+
+    def compute_again():
+        calls.append('b')
+        return {'zip': 'outro.zip'}
+
+    results = {}
+    first = run_in_thread(lambda: worker_a.do(KEY, compute), results, 'a')
+    started.wait(5)
+    # worker_b blocks on the key's file lock until worker_a has written its result
+    second = run_in_thread(lambda: worker_b.do(KEY, compute_again), results, 'b')
+    release.set()
+    first.join(5)
+    second.join(5)
+
+    assert calls == ['a']
+    assert results['a'] == results['b'] == {'zip': 'comissoes.zip'}
+
+
+def test_shared_result_is_recomputed_when_validate_rejects_it(tmp_path):
+    output = tmp_path / 'comissoes.zip'
+    output.write_bytes(b'zip')
+    flight = SingleFlight(str(tmp_path / 'state'))
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {'path': str(output)}
+
+    def validate(result):
+        return os.path.exists(result['path'])
+
+    assert flight.do(KEY, compute, validate=validate) == {'path': str(output)}
+    assert flight.do(KEY, compute, validate=validate) == {'path': str(output)}
+    assert len(calls) == 1
+
+    output.unlink()
+    flight.do(KEY, compute, validate=validate)
+    assert len(calls) == 2
+
+
+def test_leader_error_is_raised_to_waiting_callers(tmp_path, caplog):
+    caplog.set_level(logging.INFO, logger='utils.single_flight')
+    flight = SingleFlight(str(tmp_path))
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        raise RuntimeError('planilha inválida')
+
+    results = {}
+    leader = run_in_thread(lambda: flight.do(KEY, compute), results, 'leader')
+    started.wait(5)
+    follower = run_in_thread(lambda: flight.do(KEY, compute), results, 'follower')
+    wait_for_follower(caplog)
+
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert len(calls) == 1
+    assert isinstance(results['follower'], RuntimeError)
+    assert results['follower'] is results['leader']
+
+    # Nothing is cached after a failure, so the next call computes again
+    with pytest.raises(RuntimeError):
+        flight.do(KEY, compute)
+    assert len(calls) == 2
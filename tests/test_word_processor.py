@@ -0,0 +1,85 @@
+"""
+Tests that parallel rendering of the Word report matches the serial output
+"""
+
+import logging
+import os
+import zipfile
+
+import pytest
+from docx import Document
+from docx.oxml import OxmlElement
+
+from utils.calculations import CalculationEngine
+from utils.word_processor import WordProcessor
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             'templates_word', 'modelo_padrao.docx')
+
+
+def calculated_rows(count):
+    """Calculated rows spread over two months, like the pipeline passes to fill_template"""
+    engine = CalculationEngine()
+    return [
+        engine.process_row({
+            'data': f'{1 + i % 28:02d}/{5 + i * 2 // count:02d}/2025',
+            'numero_pedido': 1000 + i,
+            'nome_cliente': f'CLIENTE {i % 7}',
+            'prazo': '30/60/90' if i % 2 else '28',
+            'valor_pedido': 1000.5 + i * 13.25,
+            'frete': -7,
+            'porcentagem': -0.05,
+        })
+        for i in range(count)
+    ]
+
+
+def read_parts(path):
+    """Read every part of a docx package"""
+    with zipfile.ZipFile(path) as package:
+        return {name: package.read(name) for name in package.namelist()}
+
+
+def render(tmp_path, name, processor, rows, template_path=TEMPLATE_PATH, **kwargs):
+    """Fill the template and return the parts of the output document"""
+    output_path = str(tmp_path / name)
+    assert processor.fill_template(template_path, rows, output_path, 'JOAO', **kwargs)
+    return read_parts(output_path)
+
+
+@pytest.mark.parametrize('layout', [
+    {},
+    {'rows_per_table': 15},
+    {'rows_per_table': 15, 'split_by_month': True, 'section_per_chunk': True},
+], ids=['single_table', 'chunked', 'chunked_sections'])
+def test_parallel_output_matches_serial(tmp_path, caplog, layout):
+    caplog.set_level(logging.INFO, logger='utils.word_processor')
+    rows = calculated_rows(40)
+
+    serial = render(tmp_path, 'serial.docx', WordProcessor(), rows, **layout)
+    parallel = render(tmp_path, 'parallel.docx', WordProcessor(parallel_workers=2, parallel_min_rows=1),
+                      rows, **layout)
+
+    assert any('processes' in record.getMessage() for record in caplog.records), "rows were not rendered in parallel"
+    assert parallel.keys() == serial.keys()
+    for name in serial:
+        assert parallel[name] == serial[name], f"{name} differs"
+
+
+def test_vertically_merged_template_falls_back_to_serial(tmp_path, caplog):
+    caplog.set_level(logging.INFO, logger='utils.word_processor')
+    document = Document(TEMPLATE_PATH)
+    cell = document.tables[0].rows[0].cells[0]
+    v_merge = OxmlElement('w:vMerge')
+    v_merge.set('{http://schemas.openxmlformats.org/wordprocessingml/2006/main}val', 'restart')
+    cell._tc.get_or_add_tcPr().append(v_merge)
+    template_path = str(tmp_path / 'mesclado.docx')
+    document.save(template_path)
+    rows = calculated_rows(10)
+
+    serial = render(tmp_path, 'serial.docx', WordProcessor(), rows, template_path=template_path)
+    parallel = render(tmp_path, 'parallel.docx', WordProcessor(parallel_workers=2, parallel_min_rows=1),
+                      rows, template_path=template_path)
+
+    assert any('rendering serially' in record.getMessage() for record in caplog.records)
+    assert parallel == serial
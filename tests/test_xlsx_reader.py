@@ -0,0 +1,222 @@
+"""
+Cross-checks of the native xlsx reader against openpyxl on workbooks built with openpyxl
+"""
+
+import re
+import zipfile
+from datetime import datetime
+
+import pytest
+from openpyxl import Workbook, load_workbook
+from openpyxl.utils.datetime import CALENDAR_MAC_1904
+
+from utils.excel_processor import ExcelProcessor
+from utils.xlsx_reader import NativeXlsxWorkbook
+
+HEADERS = {1: 'Data', 2: 'Nº Pedido', 4: 'Nome cliente', 5: 'Prazo', 6: 'Valor Pedido',
+           7: 'Frete + Prazo', 9: '% Comissão'}
+
+
+def build_workbook(path, rows=12, date1904=False, insert_column=False, gaps=(), number_format=None):
+    """Write a commission sheet (header on row 3) and return its path"""
+    workbook = Workbook()
+    if date1904:
+        workbook.epoch = CALENDAR_MAC_1904
+    sheet = workbook.active
+    sheet.title = 'JOAO'
+    sheet['A1'] = 'Relatório de Comissão'
+
+    shift = 1 if insert_column else 0
+    for col, label in HEADERS.items():
+        sheet.cell(3, col + (shift if col >= 3 else 0), label)
+    if insert_column:
+        sheet.cell(3, 3, 'Vendedor')
+
+    row = 4
+    for i in range(rows):
+        if i in gaps:
+            row += 1
+        values = {
+            1: datetime(2025, 5, 1 + i % 28, 0, 0),
+            2: 1000 + i,
+            4: f'CLIENTE {i % 5}',
+            5: '30/60/90' if i % 2 else 28,
+            6: 1000.5 + i if i % 3 else f'R$ 1.{i:03d},50',
+            7: -7,
+            9: -0.05,
+        }
+        for col, value in values.items():
+            cell = sheet.cell(row, col + (shift if col >= 3 else 0), value)
+            if col == 1 and number_format:
+                cell.number_format = number_format
+        if insert_column:
+            sheet.cell(row, 3, 'VENDEDOR')
+        row += 1
+
+    workbook.save(path)
+    use_shared_strings(str(path))
+    return str(path)
+
+
+def read_parts(path):
+    """Read every part of an xlsx package as text"""
+    with zipfile.ZipFile(path) as package:
+        return {name: package.read(name).decode('utf-8') for name in package.namelist()}
+
+
+def write_parts(path, parts):
+    """Write text parts as a new xlsx package"""
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as package:
+        for name, content in parts.items():
+            package.writestr(name, content.encode('utf-8'))
+
+
+def use_shared_strings(path):
+    """Move the inline strings openpyxl writes into a shared string table, as Excel saves them"""
+    parts = read_parts(path)
+    strings = []
+
+    def to_shared(match):
+        strings.append(match.group(3))
+        return f'<c r="{match.group(1)}"{match.group(2)} t="s"><v>{len(strings) - 1}</v></c>'
+
+    parts['xl/worksheets/sheet1.xml'] = re.sub(
+        r'<c r="([A-Z]+\d+)"((?: s="\d+")?) t="inlineStr"><is><t[^>]*>(.*?)</t></is></c>',
+        to_shared, parts['xl/worksheets/sheet1.xml'])
+    parts['xl/sharedStrings.xml'] = (
+        '<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        f'count="{len(strings)}" uniqueCount="{len(strings)}">'
+        + ''.join(f'<si><t>{text}</t></si>' for text in strings) + '</sst>')
+    parts['xl/_rels/workbook.xml.rels'] = parts['xl/_rels/workbook.xml.rels'].replace(
+        '</Relationships>',
+        '<Relationship Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings" '
+        'Target="sharedStrings.xml" Id="rIdStrings"/></Relationships>')
+    parts['[Content_Types].xml'] = parts['[Content_Types].xml'].replace(
+        '</Types>',
+        '<Override PartName="/xl/sharedStrings.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/></Types>')
+    write_parts(path, parts)
+
+
+def make_inline_strings(path, refs):
+    """Rewrite the given cells of the first sheet as inline strings"""
+    parts = read_parts(path)
+    for ref in refs:
+        parts['xl/worksheets/sheet1.xml'] = re.sub(
+            rf'<c r="{ref}"[^>]*?(/>|>.*?</c>)',
+            f'<c r="{ref}" t="inlineStr"><is><t>INLINE {ref}</t></is></c>', parts['xl/worksheets/sheet1.xml'])
+    write_parts(path, parts)
+
+
+def openpyxl_rows(path, **kwargs):
+    """Rows of the active sheet read by openpyxl in read-only mode"""
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        return list(workbook.active.iter_rows(values_only=True, **kwargs))
+    finally:
+        workbook.close()
+
+
+def native_rows(path, **kwargs):
+    """Rows of the active sheet read by the native reader"""
+    workbook = NativeXlsxWorkbook(path)
+    try:
+        return list(workbook.active.iter_rows(values_only=True, **kwargs))
+    finally:
+        workbook.close()
+
+
+def extract(path, engine):
+    """Run extract_data with the given engine and an empty layout cache"""
+    ExcelProcessor._layout_cache.clear()
+    return ExcelProcessor(engine=engine).extract_data(path)
+
+
+def assert_engines_match(path):
+    """Check both engines give the same rows and extracted data, returning the latter"""
+    assert native_rows(path) == openpyxl_rows(path)
+    assert native_rows(path, min_row=4, max_col=9) == openpyxl_rows(path, min_row=4, max_col=9)
+
+    expected = extract(path, 'openpyxl')
+    assert expected is not None
+    assert extract(path, 'native') == expected
+    return expected
+
+
+def test_dates_with_1900_system(tmp_path):
+    path = build_workbook(tmp_path / 'datas_1900.xlsx')
+
+    result = assert_engines_match(path)
+    assert native_rows(path, min_row=4)[0][0] == datetime(2025, 5, 1)
+    assert result['data'][0]['data'] == '01/05/2025'
+
+
+def test_dates_with_1904_system(tmp_path):
+    path = build_workbook(tmp_path / 'datas_1904.xlsx', date1904=True)
+    workbook = NativeXlsxWorkbook(path)
+    assert workbook.date1904
+    workbook.close()
+
+    result = assert_engines_match(path)
+    assert native_rows(path, min_row=4)[0][0] == datetime(2025, 5, 1)
+    assert result['data'][0]['data'] == '01/05/2025'
+
+
+def test_shared_and_inline_strings(tmp_path):
+    path = build_workbook(tmp_path / 'strings.xlsx')
+    assert 't="s"' in read_parts(path)['xl/worksheets/sheet1.xml']
+    make_inline_strings(path, ['D4', 'E6', 'D9'])
+
+    result = assert_engines_match(path)
+    assert result['data'][0]['nome_cliente'] == 'INLINE D4'
+    assert result['data'][1]['nome_cliente'] == 'CLIENTE 1'
+
+
+def test_sparse_and_missing_rows(tmp_path):
+    path = build_workbook(tmp_path / 'lacunas.xlsx', gaps=(2, 3, 7))
+
+    result = assert_engines_match(path)
+    assert [row['row_number'] for row in result['data']][:4] == [4, 5, 7, 9]
+
+
+def test_inserted_column(tmp_path):
+    path = build_workbook(tmp_path / 'coluna_extra.xlsx', insert_column=True)
+
+    result = assert_engines_match(path)
+    assert result['data'][0]['nome_cliente'] == 'CLIENTE 0'
+    assert result['data'][0]['numero_pedido'] == 1000
+
+
+@pytest.mark.parametrize('number_format', ['dd/mm/yyyy', '[$-416]mmm/yy;@', 'yyyy-mm-dd hh:mm'])
+def test_custom_date_formats(tmp_path, number_format):
+    path = build_workbook(tmp_path / 'formato.xlsx', number_format=number_format)
+
+    assert_engines_match(path)
+    assert isinstance(native_rows(path, min_row=4)[0][0], datetime)
+
+
+def test_custom_number_format_with_date_letters_in_text(tmp_path):
+    path = build_workbook(tmp_path / 'dias.xlsx', number_format='0" dias"')
+
+    assert native_rows(path) == openpyxl_rows(path)
+    assert not isinstance(native_rows(path, min_row=4)[0][0], datetime)
+
+
+def test_parts_are_resolved_from_relationships(tmp_path):
+    original = build_workbook(tmp_path / 'original.xlsx')
+    expected_rows = openpyxl_rows(original)
+    expected = extract(original, 'openpyxl')
+
+    # Move shared strings and styles to non-default names and point the workbook rels at them.
+    # openpyxl assumes xl/styles.xml, so the untouched copy is the reference here.
+    parts = read_parts(original)
+    for old, new in (('sharedStrings.xml', 'textos.xml'), ('styles.xml', 'estilos.xml')):
+        parts[f'xl/{new}'] = parts.pop(f'xl/{old}')
+        parts['xl/_rels/workbook.xml.rels'] = parts['xl/_rels/workbook.xml.rels'].replace(
+            f'Target="{old}"', f'Target="{new}"')
+        parts['[Content_Types].xml'] = parts['[Content_Types].xml'].replace(f'/xl/{old}', f'/xl/{new}')
+    moved = str(tmp_path / 'partes.xlsx')
+    write_parts(moved, parts)
+
+    assert native_rows(moved) == expected_rows
+    assert extract(moved, 'native') == expected
@@ -0,0 +1,245 @@
+"""
+Admission control for processing jobs with a byte/row budget and a bounded FIFO queue
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows, the budget is then per process only
+    fcntl = None
+
+
+class AdmissionRejected(Exception):
+    """Raised when a job cannot be admitted (queue full or wait timed out)"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionTicket:
+    """Budget reserved by one admitted job"""
+
+    def __init__(self, controller: 'AdmissionController', cost_bytes: int):
+        self.controller = controller
+        self.cost_bytes = cost_bytes
+        self.rows = 0
+        self.ticket_id = uuid.uuid4().hex
+
+    def add_rows(self, rows: int) -> None:
+        """
+        Record rows extracted by this job so they count against the row budget
+
+        Args:
+            rows: Number of rows extracted
+        """
+        self.controller._add_rows(self, rows)
+
+
+class AdmissionController:
+    """Class to limit concurrent work by uploaded bytes and extracted rows
+
+    Without state_path the budget and queue live in this process. With a
+    state_path they live in a JSON file guarded by a file lock, so every
+    gunicorn worker on the host shares one budget and one FIFO queue.
+    """
+
+    def __init__(self, max_bytes: int, max_rows: int, max_queue: int = 8,
+                 queue_timeout: float = 60.0, retry_after: int = 5, state_path: Optional[str] = None,
+                 poll_interval: float = 0.05, stale_after: float = 3600.0):
+        self.logger = logging.getLogger(__name__)
+        self.max_bytes = max_bytes
+        self.max_rows = max_rows
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+
+        if state_path and fcntl is None:
+            self.logger.warning("File locks not available, admission budget is per process")
+            state_path = None
+        self.state_path = state_path
+        if self.state_path:
+            os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition()
+        self._state = {'queue': [], 'active': []}
+
+    @contextmanager
+    def admit(self, cost_bytes: int) -> Iterator[AdmissionTicket]:
+        """
+        Wait for budget, run the job, then release its budget
+
+        Jobs are admitted in arrival order. A job is always admitted when
+        nothing else is running, so an oversized upload cannot wait forever.
+
+        Args:
+            cost_bytes: Size of the uploaded files for this job
+
+        Yields:
+            Ticket used to report extracted rows
+
+        Raises:
+            AdmissionRejected: If the queue is full or the wait timed out
+        """
+        ticket = AdmissionTicket(self, cost_bytes)
+        self._acquire(ticket)
+        try:
+            yield ticket
+        finally:
+            self._release(ticket)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get current admission state
+
+        Returns:
+            Dictionary with active jobs, queued jobs and budget in use
+        """
+        with self._locked_state() as state:
+            return {
+                'active': len(state['active']),
+                'queued': len(state['queue']),
+                'bytes_in_flight': sum(job['bytes'] for job in state['active']),
+                'rows_in_flight': sum(job['rows'] for job in state['active']),
+                'shared': bool(self.state_path),
+            }
+
+    def _acquire(self, ticket: AdmissionTicket) -> None:
+        """Queue the ticket and block until it is at the head and fits the budget"""
+        entry = {'id': ticket.ticket_id, 'pid': os.getpid(), 'bytes': ticket.cost_bytes, 'rows': 0,
+                 'since': time.time()}
+
+        with self._locked_state() as state:
+            if len(state['queue']) >= self.max_queue:
+                self.logger.warning(f"Admission queue full ({len(state['queue'])} waiting), rejecting job")
+                raise AdmissionRejected("Admission queue is full", self.retry_after)
+            state['queue'].append(entry)
+
+        deadline = time.monotonic() + self.queue_timeout
+        try:
+            while True:
+                with self._locked_state() as state:
+                    if self._admit_head(state, entry['id']):
+                        break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.logger.warning("Timed out waiting for admission, rejecting job")
+                    raise AdmissionRejected("Timed out waiting for admission", self.retry_after)
+
+                # Local releases wake us at once; releases in other processes are polled
+                with self._wakeup:
+                    self._wakeup.wait(min(remaining, self.poll_interval))
+        except BaseException:
+            with self._locked_state() as state:
+                state['queue'] = [job for job in state['queue'] if job['id'] != entry['id']]
+            self._notify()
+            raise
+
+        # The next job in line may fit as well
+        self._notify()
+
+    def _admit_head(self, state: Dict[str, Any], ticket_id: str) -> bool:
+        """Move the ticket from the queue to the active jobs if it is first in line and fits"""
+        queue = state['queue']
+        if not queue or queue[0]['id'] != ticket_id or not self._fits(state, queue[0]):
+            return False
+
+        entry = queue.pop(0)
+        entry['since'] = time.time()
+        state['active'].append(entry)
+        return True
+
+    def _release(self, ticket: AdmissionTicket) -> None:
+        """Return the ticket's budget and wake waiting jobs"""
+        with self._locked_state() as state:
+            state['active'] = [job for job in state['active'] if job['id'] != ticket.ticket_id]
+        self._notify()
+
+    def _add_rows(self, ticket: AdmissionTicket, rows: int) -> None:
+        """Count extracted rows against the row budget"""
+        ticket.rows += rows
+        with self._locked_state() as state:
+            for job in state['active']:
+                if job['id'] == ticket.ticket_id:
+                    job['rows'] += rows
+
+    def _fits(self, state: Dict[str, Any], entry: Dict[str, Any]) -> bool:
+        """Check whether the entry fits in the remaining budget"""
+        if not state['active']:
+            return True
+        return (sum(job['bytes'] for job in state['active']) + entry['bytes'] <= self.max_bytes and
+                sum(job['rows'] for job in state['active']) < self.max_rows)
+
+    def _notify(self) -> None:
+        """Wake the jobs of this process waiting for admission"""
+        with self._wakeup:
+            self._wakeup.notify_all()
+
+    @contextmanager
+    def _locked_state(self) -> Iterator[Dict[str, Any]]:
+        """Hold the state lock and yield the state, saving changes to the shared file if any"""
+        if not self.state_path:
+            with self._lock:
+                yield self._state
+            return
+
+        fd = os.open(f'{self.state_path}.lock', os.O_CREAT | os.O_RDWR, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            state = self._read_state()
+            self._prune(state)
+            before = json.dumps(state, sort_keys=True)
+            yield state
+            if json.dumps(state, sort_keys=True) != before:
+                self._write_state(state)
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def _read_state(self) -> Dict[str, Any]:
+        """Load the shared state, starting empty if the file is missing or unreadable"""
+        try:
+            with open(self.state_path, encoding='utf-8') as state_file:
+                state = json.load(state_file)
+            return {'queue': list(state.get('queue', [])), 'active': list(state.get('active', []))}
+        except (OSError, ValueError, AttributeError):
+            return {'queue': [], 'active': []}
+
+    def _write_state(self, state: Dict[str, Any]) -> None:
+        """Write the shared state atomically"""
+        tmp_path = f'{self.state_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as state_file:
+            json.dump(state, state_file)
+        os.replace(tmp_path, self.state_path)
+
+    def _prune(self, state: Dict[str, Any]) -> None:
+        """Drop jobs of processes that died and waits that were abandoned long ago"""
+        now = time.time()
+        for key, max_age in (('queue', self.queue_timeout + self.stale_after), ('active', self.stale_after)):
+            kept = [job for job in state[key] if self._pid_alive(job['pid']) and now - job['since'] <= max_age]
+            if len(kept) != len(state[key]):
+                self.logger.warning(f"Dropped {len(state[key]) - len(kept)} stale {key} admission entries")
+                state[key] = kept
+
+    @staticmethod
+    def _pid_alive(pid: int) -> bool:
+        """Check whether a process with this pid exists"""
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
@@ -0,0 +1,174 @@
+"""
+Artifact store for generated documents with per-job keys and TTL eviction
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from typing import Dict, Any, Optional, List
+
+
+class ArtifactStore:
+    """Class to handle storage and eviction of generated result files"""
+
+    def __init__(self, root_dir: str, ttl_seconds: int = 3600, max_bytes: int = 512 * 1024 * 1024,
+                 sweep_interval: int = 300):
+        self.logger = logging.getLogger(__name__)
+        self.root_dir = root_dir
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self._lock = threading.Lock()
+        self._sweeper = None
+        self._stop_event = threading.Event()
+
+        os.makedirs(self.root_dir, exist_ok=True)
+
+    def new_job(self) -> str:
+        """
+        Create a unique job directory for one processing request
+
+        Returns:
+            Job key (hex string) identifying the job directory
+        """
+        job_key = uuid.uuid4().hex
+        os.makedirs(self._job_dir(job_key), exist_ok=True)
+        return job_key
+
+    def save(self, job_key: str, source_path: str, filename: str) -> str:
+        """
+        Atomically copy a finished file into the job directory
+
+        The file is first copied to a temporary name in the destination
+        directory and then renamed, so readers never see a partial file.
+
+        Args:
+            job_key: Job key returned by new_job
+            source_path: Path of the finished file
+            filename: Final file name inside the job directory
+
+        Returns:
+            Final path of the stored artifact
+        """
+        job_dir = self._job_dir(job_key)
+        os.makedirs(job_dir, exist_ok=True)
+        final_path = os.path.join(job_dir, filename)
+
+        fd, tmp_path = tempfile.mkstemp(dir=job_dir, prefix='.tmp_')
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file, open(source_path, 'rb') as src_file:
+                shutil.copyfileobj(src_file, tmp_file)
+            os.replace(tmp_path, final_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        return final_path
+
+    def get_path(self, job_key: str, filename: str) -> Optional[str]:
+        """
+        Resolve the path of a stored artifact
+
+        Args:
+            job_key: Job key returned by new_job
+            filename: File name inside the job directory
+
+        Returns:
+            Path to the artifact or None if it does not exist (or expired)
+        """
+        if not self._valid_key(job_key) or os.path.basename(filename) != filename or filename.startswith('.'):
+            return None
+
+        path = os.path.join(self._job_dir(job_key), filename)
+        return path if os.path.isfile(path) else None
+
+    def start_sweeper(self) -> None:
+        """Start the background thread that evicts expired and over-quota jobs"""
+        with self._lock:
+            if self._sweeper is not None and self._sweeper.is_alive():
+                return
+            self._stop_event.clear()
+            self._sweeper = threading.Thread(target=self._sweep_loop, name='artifact-sweeper', daemon=True)
+            self._sweeper.start()
+
+    def stop_sweeper(self) -> None:
+        """Stop the background sweeper thread"""
+        self._stop_event.set()
+
+    def sweep(self) -> Dict[str, Any]:
+        """
+        Remove expired jobs, then the oldest jobs while over the byte quota
+
+        Returns:
+            Dictionary with the number of removed jobs and remaining bytes
+        """
+        with self._lock:
+            now = time.time()
+            jobs = self._list_jobs()
+            removed = 0
+
+            # Evict jobs older than the TTL
+            remaining = []
+            for job in jobs:
+                if now - job['mtime'] > self.ttl_seconds:
+                    self._remove_job(job['key'])
+                    removed += 1
+                else:
+                    remaining.append(job)
+
+            # Evict oldest jobs until total size fits the quota
+            remaining.sort(key=lambda job: job['mtime'])
+            total_bytes = sum(job['size'] for job in remaining)
+            while remaining and total_bytes > self.max_bytes:
+                oldest = remaining.pop(0)
+                self._remove_job(oldest['key'])
+                total_bytes -= oldest['size']
+                removed += 1
+
+            if removed:
+                self.logger.info(f"Artifact sweep removed {removed} jobs, {total_bytes} bytes remaining")
+
+            return {'removed': removed, 'total_bytes': total_bytes}
+
+    def _sweep_loop(self) -> None:
+        """Run sweep periodically until stopped"""
+        while not self._stop_event.is_set():
+            try:
+                self.sweep()
+            except Exception as e:
+                self.logger.error(f"Error sweeping artifacts: {str(e)}")
+            self._stop_event.wait(self.sweep_interval)
+
+    def _list_jobs(self) -> List[Dict[str, Any]]:
+        """List job directories with their size and last modification time"""
+        jobs = []
+        for entry in os.scandir(self.root_dir):
+            if not entry.is_dir() or not self._valid_key(entry.name):
+                continue
+            size = 0
+            mtime = entry.stat().st_mtime
+            for file_entry in os.scandir(entry.path):
+                if file_entry.is_file():
+                    stat = file_entry.stat()
+                    size += stat.st_size
+                    mtime = max(mtime, stat.st_mtime)
+            jobs.append({'key': entry.name, 'size': size, 'mtime': mtime})
+        return jobs
+
+    def _remove_job(self, job_key: str) -> None:
+        """Delete a job directory and everything inside it"""
+        shutil.rmtree(self._job_dir(job_key), ignore_errors=True)
+
+    def _job_dir(self, job_key: str) -> str:
+        """Path of the directory for a job key"""
+        return os.path.join(self.root_dir, job_key)
+
+    @staticmethod
+    def _valid_key(job_key: str) -> bool:
+        """Check that a job key looks like one generated by new_job"""
+        return len(job_key) == 32 and all(c in '0123456789abcdef' for c in job_key)
@@ -6,6 +6,24 @@ import logging
 import re
 from typing import Dict, Any, Optional
 
+# Precompiled patterns used on every row
+DIGITS_RE = re.compile(r'\d+')
+NON_NUMERIC_RE = re.compile(r'[^\d.-]')
+
+
+def format_brl(value: float) -> str:
+    """
+    Format a number with two decimals in pt-BR style (1.234,56), without the R$ symbol
+
+    Args:
+        value: Number to format
+
+    Returns:
+        Formatted number
+    """
+    return f"{value:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
+
+
 class CalculationEngine:
     """Class to handle calculations for commission processing"""
     
@@ -108,7 +126,7 @@ class CalculationEngine:
             
             # Extract numeric value from last part
             # Use regex to find numbers
-            numbers = re.findall(r'\d+', last_part)
+            numbers = DIGITS_RE.findall(last_part)
             if not numbers:
                 self.logger.warning(f"No numbers found in last part '{last_part}' of prazo '{prazo_str}'")
                 return 0
@@ -191,6 +209,10 @@ class CalculationEngine:
             if value is None:
                 return 0.0
             
+            # Fast path for columns already converted to numbers by ExcelProcessor
+            if type(value) is float:
+                return value
+            
             if isinstance(value, (int, float)):
                 return float(value)
             
@@ -199,7 +221,7 @@ class CalculationEngine:
                 cleaned = value.strip()
                 cleaned = cleaned.replace('R$', '').replace('$', '')
                 cleaned = cleaned.replace('.', '').replace(',', '.')  # Handle Brazilian format
-                cleaned = re.sub(r'[^\d.-]', '', cleaned)  # Keep only digits, dots, and minus
+                cleaned = NON_NUMERIC_RE.sub('', cleaned)  # Keep only digits, dots, and minus
                 
                 if cleaned:
                     return float(cleaned)
@@ -305,8 +327,8 @@ class CalculationEngine:
                 last_part = parts[-1].strip()
                 
                 # Extract numbers from first and last parts
-                first_numbers = re.findall(r'\d+', first_part)
-                last_numbers = re.findall(r'\d+', last_part)
+                first_numbers = DIGITS_RE.findall(first_part)
+                last_numbers = DIGITS_RE.findall(last_part)
                 
                 if first_numbers and last_numbers:
                     first_num = first_numbers[0]
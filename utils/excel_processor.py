@@ -2,19 +2,77 @@
 Excel file processing utilities for extracting data from specific cells
 """
 
+import itertools
 import logging
+import re
+import threading
+import unicodedata
+from datetime import date, datetime
 from openpyxl import load_workbook
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Callable, Tuple, Iterator
+from utils.xlsx_reader import NativeXlsxWorkbook
+
+# Brazilian currency text such as "R$ 1.234,56", "1234,5" or "-10"
+BR_CURRENCY_RE = re.compile(r'\s*(-)?\s*(?:R\$)?\s*(-)?\s*(\d+(?:\.\d{3})*)(?:,(\d+))?\s*')
 
 class ExcelProcessor:
     """Class to handle Excel file processing and data extraction"""
     
-    def __init__(self):
+    # Mapped fields and their 1-based column index (A, B, D, E, F, G, I)
+    COLUMN_MAP = [
+        ('data', 1),             # Column A - Data
+        ('numero_pedido', 2),    # Column B - Número do Pedido
+        ('nome_cliente', 4),     # Column D - Nome do Cliente
+        ('prazo', 5),            # Column E - Prazo
+        ('valor_pedido', 6),     # Column F - Valor do Pedido
+        ('porcentagem', 7),      # Column G - Porcentagem
+        ('frete', 9),            # Column I - Frete
+    ]
+    
+    # Fields that are only ever used as numbers downstream
+    NUMERIC_FIELDS = {'valor_pedido', 'porcentagem', 'frete'}
+    
+    # Number of non-empty cells sampled per column to infer its type
+    SCHEMA_SAMPLE_ROWS = 20
+    
+    FIRST_DATA_ROW = 4
+    
+    # Header labels (normalized: lowercase, no accents) recognized for each field.
+    # Column G ("Frete + Prazo") feeds 'porcentagem' and column I ("% Comissão")
+    # feeds 'frete', matching the fixed layout above.
+    HEADER_PATTERNS = [
+        ('data', re.compile(r'^data\b')),
+        ('numero_pedido', re.compile(r'^(n[o°]?\.?\s*)?pedido\b')),
+        ('nome_cliente', re.compile(r'\bcliente\b')),
+        ('prazo', re.compile(r'^prazo\b')),
+        ('valor_pedido', re.compile(r'^valor(\s+(do\s+)?pedido)?$')),
+        ('porcentagem', re.compile(r'\bfrete\b')),
+        ('frete', re.compile(r'^%')),
+    ]
+    
+    # Rows scanned from the top of the sheet when looking for the header row
+    HEADER_SCAN_ROWS = 10
+    
+    # Resolved layouts keyed by (header row, normalized header cells), shared by all instances
+    LAYOUT_CACHE_SIZE = 128
+    _layout_cache: Dict[Tuple[int, Tuple[str, ...]], Dict[str, Any]] = {}
+    _layout_cache_lock = threading.Lock()
+    
+    # Reader engines for extract_data: openpyxl (read-only) or the minimal native reader
+    ENGINES = ('openpyxl', 'native')
+    
+    def __init__(self, engine: str = 'openpyxl'):
         self.logger = logging.getLogger(__name__)
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown Excel reader engine: {engine}")
+        self.engine = engine
     
     def extract_data(self, file_path: str) -> Optional[List[Dict[str, Any]]]:
         """
-        Extract data from Excel file all rows starting from row 4, columns A, B, D, E, F, G, I
+        Extract data from Excel file all rows below the header row
+        
+        Columns are located by header name; sheets without a recognizable header
+        use the fixed layout (columns A, B, D, E, F, G, I from row 4).
         
         Args:
             file_path: Path to the Excel file
@@ -23,8 +81,8 @@ class ExcelProcessor:
             List of dictionaries with extracted data or None if error
         """
         try:
-            # Load workbook
-            workbook = load_workbook(file_path, data_only=True)
+            # Load workbook in streaming mode, only cell values are needed
+            workbook = self._open_workbook(file_path)
             
             # Get the first worksheet
             worksheet = workbook.active
@@ -32,32 +90,45 @@ class ExcelProcessor:
             
             all_rows_data = []
             
-            # Process all rows starting from row 4
-            for row_num in range(4, worksheet.max_row + 1):
-                # Extract data from current row, specific columns
-                row_data = {
-                    'data': self._get_cell_value(worksheet, f'A{row_num}'),        # Column A - Data
-                    'numero_pedido': self._get_cell_value(worksheet, f'B{row_num}'), # Column B - Número do Pedido
-                    'nome_cliente': self._get_cell_value(worksheet, f'D{row_num}'),  # Column D - Nome do Cliente
-                    'prazo': self._get_cell_value(worksheet, f'E{row_num}'),         # Column E - Prazo
-                    'valor_pedido': self._get_cell_value(worksheet, f'F{row_num}'),  # Column F - Valor do Pedido
-                    'porcentagem': self._get_cell_value(worksheet, f'G{row_num}'),   # Column G - Porcentagem
-                    'frete': self._get_cell_value(worksheet, f'I{row_num}'),         # Column I - Frete
-                    'row_number': row_num
-                }
+            # Find which column holds each field, reusing known layouts
+            layout = self.resolve_layout(worksheet)
+            column_map = layout['columns']
+            first_data_row = layout['first_data_row']
+            
+            max_col = max(col for _, col in column_map)
+            try:
+                rows = worksheet.iter_rows(min_row=first_data_row, max_col=max_col, values_only=True)
                 
-                # Check if row has significant data (at least valor_pedido or nome_cliente)
-                has_data = (
-                    (row_data['valor_pedido'] is not None and row_data['valor_pedido'] != 0) or
-                    (row_data['nome_cliente'] is not None and str(row_data['nome_cliente']).strip())
-                )
+                # Pick one converter per column from the first rows, then stream the rest
+                sample_rows = self._sample_rows(rows, column_map)
+                schema = self.infer_column_schema(sample_rows, column_map)
+                converters = [(field, col - 1, schema[field]) for field, col in column_map]
                 
-                if has_data:
-                    all_rows_data.append(row_data)
-                    self.logger.info(f"Extracted data from row {row_num}: {row_data}")
+                # Process all rows starting from the first data row
+                for offset, values in enumerate(itertools.chain(sample_rows, rows)):
+                    row_num = first_data_row + offset
+                    
+                    # Extract data from current row, specific columns
+                    row_data = {
+                        field: convert(values[index]) if index < len(values) else None
+                        for field, index, convert in converters
+                    }
+                    row_data['row_number'] = row_num
+                    
+                    # Check if row has significant data (at least valor_pedido or nome_cliente)
+                    has_data = (
+                        (row_data['valor_pedido'] is not None and row_data['valor_pedido'] != 0) or
+                        (row_data['nome_cliente'] is not None and str(row_data['nome_cliente']).strip())
+                    )
+                    
+                    if has_data:
+                        all_rows_data.append(row_data)
+                        self.logger.info(f"Extracted data from row {row_num}: {row_data}")
+            finally:
+                workbook.close()
             
             if not all_rows_data:
-                self.logger.warning("No data found in Excel file starting from row 4")
+                self.logger.warning(f"No data found in Excel file starting from row {first_data_row}")
                 return None
             
             # Add worksheet name to the data
@@ -72,40 +143,247 @@ class ExcelProcessor:
             self.logger.error(f"Error extracting data from Excel file: {str(e)}")
             return None
     
-    def _get_cell_value(self, worksheet, cell_address: str) -> Any:
+    def _open_workbook(self, file_path: str):
         """
-        Get value from a specific cell, handling different data types
+        Open a workbook for streaming reads with the configured engine
+        
+        Args:
+            file_path: Path to the Excel file
+            
+        Returns:
+            Workbook object exposing active, iter_rows(values_only=True) and close()
+        """
+        if self.engine == 'native':
+            return NativeXlsxWorkbook(file_path)
+        return load_workbook(file_path, data_only=True, read_only=True)
+    
+    def resolve_layout(self, worksheet) -> Dict[str, Any]:
+        """
+        Find the column of each field from the sheet's header row
+        
+        Layouts already seen are looked up by their header cells, so a known
+        layout costs one header row read instead of a full detection.
         
         Args:
             worksheet: The worksheet object
-            cell_address: Cell address (e.g., 'A4')
             
         Returns:
-            Cell value or None if empty
+            Dictionary with 'columns' (field, 1-based column) and 'first_data_row'
         """
-        try:
-            cell = worksheet[cell_address]
-            value = cell.value
+        top_rows = [
+            tuple(self._normalize_header(value) for value in values)
+            for values in worksheet.iter_rows(min_row=1, max_row=self.HEADER_SCAN_ROWS, values_only=True)
+        ]
+        
+        # Fast path: check the header row positions of known layouts
+        with self._layout_cache_lock:
+            known_header_rows = {header_row for header_row, _ in self._layout_cache}
+            for header_row in sorted(known_header_rows):
+                if header_row <= len(top_rows):
+                    layout = self._layout_cache.get((header_row, top_rows[header_row - 1]))
+                    if layout is not None:
+                        return layout
+        
+        layout = self._detect_layout(top_rows)
+        if layout is None:
+            self.logger.warning("Header row not found, using fixed column layout")
+            return {'columns': self.COLUMN_MAP, 'first_data_row': self.FIRST_DATA_ROW}
+        
+        with self._layout_cache_lock:
+            if len(self._layout_cache) >= self.LAYOUT_CACHE_SIZE:
+                self._layout_cache.pop(next(iter(self._layout_cache)))
+            header_row = layout['first_data_row'] - 1
+            self._layout_cache[(header_row, top_rows[header_row - 1])] = layout
+        
+        self.logger.info(f"Detected header at row {header_row}: {layout['columns']}")
+        return layout
+    
+    def _detect_layout(self, top_rows: List[Tuple[str, ...]]) -> Optional[Dict[str, Any]]:
+        """
+        Look for a row whose cells name every mapped field
+        
+        Args:
+            top_rows: Normalized cell texts of the first rows of the sheet
             
-            # Handle None values
-            if value is None:
-                return None
+        Returns:
+            Layout dictionary or None if no row names all fields
+        """
+        for row_index, headers in enumerate(top_rows, start=1):
+            claimed = set()
+            columns = []
+            for field, pattern in self.HEADER_PATTERNS:
+                for col, text in enumerate(headers, start=1):
+                    if col not in claimed and text and pattern.search(text):
+                        claimed.add(col)
+                        columns.append((field, col))
+                        break
             
-            # Handle datetime objects - convert to string
-            if hasattr(value, 'strftime'):
-                return value.strftime('%d/%m/%Y')
+            if len(columns) == len(self.HEADER_PATTERNS):
+                return {'columns': columns, 'first_data_row': row_index + 1}
+        
+        return None
+    
+    def _normalize_header(self, value: Any) -> str:
+        """
+        Normalize a header cell for matching: lowercase, no accents, single spaces
+        
+        Args:
+            value: Raw cell value
             
-            # Handle numeric values
-            if isinstance(value, (int, float)):
-                return value
+        Returns:
+            Normalized text (empty for non-text cells)
+        """
+        if not isinstance(value, str):
+            return ""
+        
+        text = unicodedata.normalize('NFKD', value)
+        text = ''.join(c for c in text if not unicodedata.combining(c))
+        return ' '.join(text.lower().split())
+    
+    def _sample_rows(self, rows: Iterator[tuple], column_map: List[Tuple[str, int]]) -> List[tuple]:
+        """
+        Read rows from the iterator until SCHEMA_SAMPLE_ROWS of them have a mapped value
+        
+        Args:
+            rows: Row tuple iterator starting at the first data row
+            column_map: List of (field, 1-based column) pairs
+            
+        Returns:
+            Rows consumed from the iterator, in order (including empty ones)
+        """
+        indexes = [col - 1 for _, col in column_map]
+        sample_rows = []
+        non_empty = 0
+        for values in rows:
+            sample_rows.append(values)
+            if any(index < len(values) and values[index] is not None for index in indexes):
+                non_empty += 1
+                if non_empty >= self.SCHEMA_SAMPLE_ROWS:
+                    break
+        return sample_rows
+    
+    def infer_column_schema(self, rows: List[tuple], column_map: List[Tuple[str, int]]) -> Dict[str, Callable[[Any], Any]]:
+        """
+        Choose a specialized converter for each mapped column by sampling its first cells
+        
+        A column whose sampled cells are all numbers, all dates, all text or
+        (for numeric fields) all Brazilian currency text gets a converter for
+        that type. Cells that don't match still go through the generic path.
+        
+        Args:
+            rows: Row tuples (values only) starting at the first data row
+            column_map: List of (field, 1-based column) pairs
+            
+        Returns:
+            Dictionary mapping field name to converter function
+        """
+        schema = {}
+        
+        for field, col in column_map:
+            index = col - 1
+            sample = []
+            for values in rows:
+                value = values[index] if index < len(values) else None
+                if value is not None:
+                    sample.append(value)
+                    if len(sample) >= self.SCHEMA_SAMPLE_ROWS:
+                        break
             
-            # Handle string values - strip whitespace
-            if isinstance(value, str):
-                stripped = value.strip()
-                return stripped if stripped else None
+            converter = self._convert_value
+            kind = 'generic'
+            if sample:
+                if all(type(v) in (int, float) for v in sample):
+                    converter, kind = self._convert_numeric, 'numeric'
+                elif all(isinstance(v, (datetime, date)) for v in sample):
+                    converter, kind = self._convert_date, 'date'
+                elif all(isinstance(v, str) for v in sample):
+                    if field in self.NUMERIC_FIELDS and all(BR_CURRENCY_RE.fullmatch(v) for v in sample):
+                        converter, kind = self._convert_currency, 'currency'
+                    else:
+                        converter, kind = self._convert_text, 'text'
             
-            # Return as-is for other types
+            schema[field] = converter
+            self.logger.debug(f"Column {field} inferred as {kind}")
+        
+        return schema
+    
+    def _convert_numeric(self, value: Any) -> Any:
+        """Pass numbers through unchanged, other values use the generic path"""
+        if type(value) in (int, float):
             return value
+        return self._convert_value(value)
+    
+    def _convert_date(self, value: Any) -> Any:
+        """Format dates as dd/mm/YYYY, other values use the generic path"""
+        if isinstance(value, (datetime, date)):
+            return value.strftime('%d/%m/%Y')
+        return self._convert_value(value)
+    
+    def _convert_text(self, value: Any) -> Any:
+        """Strip text cells, other values use the generic path"""
+        if type(value) is str:
+            stripped = value.strip()
+            return stripped if stripped else None
+        return self._convert_value(value)
+    
+    def _convert_currency(self, value: Any) -> Any:
+        """
+        Parse Brazilian currency text to float, other values use the generic path
+        
+        Zero amounts are left as text so the empty-row check behaves as before.
+        """
+        if type(value) is str:
+            match = BR_CURRENCY_RE.fullmatch(value)
+            if match:
+                sign_before, sign_after, integer_part, decimal_part = match.groups()
+                number = float(integer_part.replace('.', '') + ('.' + decimal_part if decimal_part else ''))
+                if number != 0:
+                    return -number if (sign_before or sign_after) else number
+        return self._convert_value(value)
+    
+    def _convert_value(self, value: Any) -> Any:
+        """
+        Convert a raw cell value, handling different data types
+        
+        Args:
+            value: The raw cell value
+            
+        Returns:
+            Converted value or None if empty
+        """
+        # Handle None values
+        if value is None:
+            return None
+        
+        # Handle datetime objects - convert to string
+        if hasattr(value, 'strftime'):
+            return value.strftime('%d/%m/%Y')
+        
+        # Handle numeric values
+        if isinstance(value, (int, float)):
+            return value
+        
+        # Handle string values - strip whitespace
+        if isinstance(value, str):
+            stripped = value.strip()
+            return stripped if stripped else None
+        
+        # Return as-is for other types
+        return value
+    
+    def _get_cell_value(self, worksheet, cell_address: str) -> Any:
+        """
+        Get value from a specific cell, handling different data types
+        
+        Args:
+            worksheet: The worksheet object
+            cell_address: Cell address (e.g., 'A4')
+            
+        Returns:
+            Cell value or None if empty
+        """
+        try:
+            return self._convert_value(worksheet[cell_address].value)
             
         except Exception as e:
             self.logger.warning(f"Error getting value from cell {cell_address}: {str(e)}")
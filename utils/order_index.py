@@ -0,0 +1,107 @@
+"""
+Batch-wide index of order numbers for duplicate detection across uploaded files
+"""
+
+import csv
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+
+from utils.calculations import format_brl
+
+
+class OrderIndex:
+    """Class to detect repeated order numbers while rows are being processed"""
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._first_seen: Dict[str, Tuple[str, Any]] = {}
+        self.duplicates: List[Dict[str, Any]] = []
+
+    def add(self, numero_pedido: Any, source_file: str, row_number: Any, valor_pedido: Any = None) -> bool:
+        """
+        Register an order number, recording it as duplicate if already seen in this batch
+
+        Args:
+            numero_pedido: Order number from the sheet
+            source_file: Name of the uploaded file the row came from
+            row_number: Row number in the sheet
+            valor_pedido: Order value, kept for the report
+
+        Returns:
+            True if the order number was already seen, False otherwise
+        """
+        key = self._normalize(numero_pedido)
+        if not key:
+            return False
+
+        first = self._first_seen.get(key)
+        if first is None:
+            self._first_seen[key] = (source_file, row_number)
+            return False
+
+        self.duplicates.append({
+            'numero_pedido': key,
+            'arquivo': source_file,
+            'linha': row_number,
+            'valor_pedido': valor_pedido,
+            'primeiro_arquivo': first[0],
+            'primeira_linha': first[1],
+        })
+        self.logger.warning(f"Duplicate order {key} in {source_file} row {row_number} "
+                            f"(first seen in {first[0]} row {first[1]})")
+        return True
+
+    def write_csv(self, output_path: str) -> None:
+        """
+        Write the duplicate report as a CSV file readable by Excel (pt-BR)
+
+        Args:
+            output_path: Path where the CSV will be saved
+        """
+        with open(output_path, 'w', newline='', encoding='utf-8-sig') as csv_file:
+            writer = csv.writer(csv_file, delimiter=';')
+            writer.writerow(['Nº Pedido', 'Arquivo', 'Linha', 'Valor Pedido', 'Primeiro Arquivo', 'Primeira Linha'])
+            for duplicate in self.duplicates:
+                writer.writerow([
+                    duplicate['numero_pedido'],
+                    duplicate['arquivo'],
+                    duplicate['linha'],
+                    self._format_valor(duplicate['valor_pedido']),
+                    duplicate['primeiro_arquivo'],
+                    duplicate['primeira_linha'],
+                ])
+
+    def _format_valor(self, valor_pedido: Any) -> str:
+        """
+        Format an order value the way pt-BR Excel reads it (1.234,56)
+
+        Args:
+            valor_pedido: Raw order value
+
+        Returns:
+            Formatted value, or the value as text if it is not a number
+        """
+        if valor_pedido is None:
+            return ''
+        if isinstance(valor_pedido, bool) or not isinstance(valor_pedido, (int, float)):
+            return str(valor_pedido)
+        return format_brl(valor_pedido)
+
+    def _normalize(self, numero_pedido: Any) -> Optional[str]:
+        """
+        Normalize an order number so 19977, 19977.0 and ' 19977 ' match
+
+        Args:
+            numero_pedido: Raw order number
+
+        Returns:
+            Normalized string or None if empty
+        """
+        if numero_pedido is None:
+            return None
+
+        if isinstance(numero_pedido, float) and numero_pedido.is_integer():
+            numero_pedido = int(numero_pedido)
+
+        key = str(numero_pedido).strip()
+        return key or None
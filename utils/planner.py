@@ -0,0 +1,150 @@
+"""
+Workload planner that picks an execution strategy per uploaded file
+"""
+
+import logging
+import os
+import threading
+from collections import Counter
+from typing import Dict, Any
+
+from utils.xlsx_reader import NativeXlsxWorkbook
+
+
+class WorkloadPlanner:
+    """Class to estimate a file's workload cheaply and choose how to process it"""
+
+    # Rough per-row costs used for the estimates
+    XML_BYTES_PER_ROW = 300          # sheet XML size of one row of the commission layout
+    EXTRACT_BYTES_PER_ROW = 2 * 1024  # memory to hold one extracted + calculated row
+    RENDER_BYTES_PER_ROW = 16 * 1024  # python-docx/lxml memory for one rendered table row
+
+    FIRST_DATA_ROW = 4
+
+    def __init__(self, memory_budget: int, default_engine: str = 'openpyxl', streaming_min_rows: int = 5000,
+                 parallel_workers: int = 0, parallel_min_rows: int = 2000):
+        self.logger = logging.getLogger(__name__)
+        self.memory_budget = memory_budget
+        self.default_engine = default_engine
+        self.streaming_min_rows = streaming_min_rows
+        self.parallel_workers = parallel_workers
+        self.parallel_min_rows = parallel_min_rows
+
+        self._metrics = Counter()
+        self._metrics_lock = threading.Lock()
+
+    def estimate(self, file_path: str) -> Dict[str, Any]:
+        """
+        Estimate the size of a workbook without loading its cells
+
+        Uses the upload size, the sheet's <dimension> tag and, when that tag
+        is missing, the uncompressed size of the sheet XML.
+
+        Args:
+            file_path: Path to the Excel file
+
+        Returns:
+            Dictionary with upload_bytes, sheet_xml_bytes, dimension, estimated_rows and source
+        """
+        estimate = {
+            'upload_bytes': os.path.getsize(file_path),
+            'sheet_xml_bytes': None,
+            'dimension': None,
+            'estimated_rows': None,
+            'source': 'upload_size',
+        }
+
+        try:
+            workbook = NativeXlsxWorkbook(file_path)
+            try:
+                sheet = workbook.active
+                estimate['sheet_xml_bytes'] = sheet.xml_size()
+                estimate['dimension'] = sheet.read_dimension()
+            finally:
+                workbook.close()
+        except Exception as e:
+            self.logger.warning(f"Could not inspect workbook for planning: {str(e)}")
+
+        max_row = self._dimension_max_row(estimate['dimension'])
+        if max_row and max_row > 1:
+            estimate['estimated_rows'] = max(0, max_row - self.FIRST_DATA_ROW + 1)
+            estimate['source'] = 'dimension'
+        elif estimate['sheet_xml_bytes']:
+            estimate['estimated_rows'] = estimate['sheet_xml_bytes'] // self.XML_BYTES_PER_ROW
+            estimate['source'] = 'sheet_xml_size'
+        else:
+            # Compressed sheets are several times smaller than their XML
+            estimate['estimated_rows'] = estimate['upload_bytes'] * 4 // self.XML_BYTES_PER_ROW
+
+        return estimate
+
+    def plan(self, file_path: str) -> Dict[str, Any]:
+        """
+        Choose reader engine and rendering mode for one file under the memory budget
+
+        Small files use the default reader and render in the request process.
+        Large files switch to the streaming native reader, and very large
+        tables are rendered by the process pool when the budget allows the
+        extra copies the workers hold.
+
+        Args:
+            file_path: Path to the Excel file
+
+        Returns:
+            Plan dictionary with reader_engine, render_workers and the estimate
+        """
+        estimate = self.estimate(file_path)
+        rows = estimate['estimated_rows'] or 0
+
+        serial_memory = rows * (self.EXTRACT_BYTES_PER_ROW + self.RENDER_BYTES_PER_ROW)
+        # Workers build their own copy of the rows next to the stitched document
+        parallel_memory = serial_memory + rows * self.RENDER_BYTES_PER_ROW
+
+        reader_engine = self.default_engine
+        if rows >= self.streaming_min_rows or serial_memory > self.memory_budget:
+            reader_engine = 'native'
+
+        render_workers = 0
+        if (self.parallel_workers > 1 and rows >= self.parallel_min_rows and
+                parallel_memory <= self.memory_budget):
+            render_workers = self.parallel_workers
+
+        plan = {
+            'reader_engine': reader_engine,
+            'render_workers': render_workers,
+            'estimated_memory_bytes': parallel_memory if render_workers else serial_memory,
+            'over_budget': serial_memory > self.memory_budget,
+            'estimate': estimate,
+        }
+
+        with self._metrics_lock:
+            self._metrics['files_planned'] += 1
+            self._metrics[f'reader_{reader_engine}'] += 1
+            self._metrics['render_parallel' if render_workers else 'render_serial'] += 1
+            if plan['over_budget']:
+                self._metrics['over_budget'] += 1
+
+        log = self.logger.warning if plan['over_budget'] else self.logger.info
+        log(f"Plan for {os.path.basename(file_path)}: ~{rows} rows ({estimate['source']}), "
+            f"reader={reader_engine}, render_workers={render_workers}, "
+            f"estimated memory {plan['estimated_memory_bytes'] // (1024 * 1024)}MB of "
+            f"{self.memory_budget // (1024 * 1024)}MB")
+        return plan
+
+    def metrics(self) -> Dict[str, int]:
+        """
+        Get counters of the decisions taken so far in this process
+
+        Returns:
+            Dictionary of counter name to count
+        """
+        with self._metrics_lock:
+            return dict(self._metrics)
+
+    @staticmethod
+    def _dimension_max_row(ref: Any) -> int:
+        """Last row of a dimension reference such as 'A1:L55' (0 if unknown)"""
+        if not ref:
+            return 0
+        digits = ''.join(c for c in ref.split(':')[-1] if c.isdigit())
+        return int(digits) if digits else 0
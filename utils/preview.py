@@ -0,0 +1,188 @@
+"""
+Short-lived server-side cache of parsed and calculated batches for the review step
+"""
+
+import json
+import logging
+import math
+import os
+import tempfile
+from typing import Dict, Any, Optional, List
+
+from utils.artifact_store import ArtifactStore
+from utils.order_index import OrderIndex
+
+
+class PreviewCache:
+    """Class to keep a calculated batch on disk until the user confirms or it expires
+
+    A batch is stored as a small index (file names, totals, duplicates and
+    page counts) plus one JSON part per page of rows, so a review page only
+    reads the index and its own rows. Confirming reads every part back.
+    """
+
+    INDEX_FILENAME = 'index.json'
+    TOTAL_FIELDS = ('valor_pedido', 'valor_comissao', 'referencia_comissao')
+
+    def __init__(self, store: ArtifactStore, page_size: int = 50):
+        self.logger = logging.getLogger(__name__)
+        self.store = store
+        self.page_size = page_size
+
+    def save(self, batch: Dict[str, Any]) -> str:
+        """
+        Store a batch and return its key
+
+        The batch lives on disk as JSON so any worker process can serve the
+        review pages and the confirm request; the store evicts it after its TTL.
+        Only the duplicates of the batch's OrderIndex are kept.
+
+        Args:
+            batch: Batch from the pipeline's prepare step
+
+        Returns:
+            Preview key
+        """
+        preview_key = self.store.new_job()
+
+        files = []
+        for file_index, entry in enumerate(batch['files']):
+            rows = entry['rows']
+            pages = max(1, math.ceil(len(rows) / self.page_size))
+            for page in range(1, pages + 1):
+                start = (page - 1) * self.page_size
+                self._write_part(preview_key, self._page_filename(file_index, page),
+                                 rows[start:start + self.page_size])
+            files.append({key: value for key, value in entry.items() if key != 'rows'} | {'pages': pages})
+
+        # The index is written last, so a key whose index exists has all of its pages
+        index = {key: value for key, value in batch.items() if key not in ('files', 'order_index')}
+        index.update(files=files, duplicates=batch['order_index'].duplicates, page_size=self.page_size)
+        self._write_part(preview_key, self.INDEX_FILENAME, index)
+        return preview_key
+
+    def load_index(self, preview_key: str) -> Optional[Dict[str, Any]]:
+        """
+        Load the index of a stored batch, without any rows
+
+        Args:
+            preview_key: Key returned by save
+
+        Returns:
+            Index with the files, totals and duplicates, or None if the key is unknown, expired or unreadable
+        """
+        return self._read_part(preview_key, self.INDEX_FILENAME)
+
+    def load(self, preview_key: str) -> Optional[Dict[str, Any]]:
+        """
+        Load a stored batch with all of its rows
+
+        Args:
+            preview_key: Key returned by save
+
+        Returns:
+            The batch with its OrderIndex rebuilt, or None if the key is unknown, expired or unreadable
+        """
+        batch = self.load_index(preview_key)
+        if batch is None:
+            return None
+
+        try:
+            for file_index, entry in enumerate(batch['files']):
+                entry['rows'] = []
+                for page in range(1, entry.pop('pages') + 1):
+                    rows = self._read_part(preview_key, self._page_filename(file_index, page))
+                    if rows is None:
+                        return None
+                    entry['rows'].extend(rows)
+
+            order_index = OrderIndex()
+            order_index.duplicates = list(batch.pop('duplicates'))
+            batch.pop('page_size', None)
+            batch['order_index'] = order_index
+            return batch
+        except (KeyError, TypeError, AttributeError) as e:
+            self.logger.warning(f"Could not load preview {preview_key}: {str(e)}")
+            return None
+
+    def page(self, preview_key: str, index: Dict[str, Any], file_index: int, page: int) -> Optional[Dict[str, Any]]:
+        """
+        Read one page of a file's calculated rows for display
+
+        Args:
+            preview_key: Key returned by save
+            index: Index returned by load_index
+            file_index: Index of the file inside the batch
+            page: 1-based page number (clamped to the valid range)
+
+        Returns:
+            Dictionary with rows, page, pages, first_row and the file entry, or None if no such file
+        """
+        files = index.get('files', [])
+        if not 0 <= file_index < len(files):
+            return None
+
+        entry = files[file_index]
+        pages = entry['pages']
+        page = min(max(1, page), pages)
+        rows = self._read_part(preview_key, self._page_filename(file_index, page))
+        if rows is None:
+            return None
+
+        return {
+            'file': entry,
+            'file_index': file_index,
+            'rows': rows,
+            'first_row': (page - 1) * index['page_size'] + 1,
+            'page': page,
+            'pages': pages,
+        }
+
+    @classmethod
+    def totals(cls, rows: List[Dict[str, Any]]) -> Dict[str, float]:
+        """
+        Sum the monetary columns of calculated rows
+
+        Args:
+            rows: Rows returned by CalculationEngine.process_row
+
+        Returns:
+            Dictionary with the row count and one total per monetary field
+        """
+        totals = {field: 0.0 for field in cls.TOTAL_FIELDS}
+        for row in rows:
+            for field in cls.TOTAL_FIELDS:
+                value = row.get(field)
+                if isinstance(value, (int, float)):
+                    totals[field] += value
+        totals['linhas'] = len(rows)
+        return totals
+
+    @staticmethod
+    def _page_filename(file_index: int, page: int) -> str:
+        """Name of the part holding one page of a file's rows"""
+        return f'file{file_index}_page{page}.json'
+
+    def _write_part(self, preview_key: str, filename: str, data: Any) -> None:
+        """Write one JSON part of a batch into its job directory"""
+        fd, tmp_path = tempfile.mkstemp(suffix='.json')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as tmp_file:
+                # Rows that failed calculation may still hold raw cell values such as dates
+                json.dump(data, tmp_file, ensure_ascii=False, default=str)
+            self.store.save(preview_key, tmp_path, filename)
+        finally:
+            os.remove(tmp_path)
+
+    def _read_part(self, preview_key: str, filename: str) -> Any:
+        """Read one JSON part of a batch, or None if it is missing or unreadable"""
+        path = self.store.get_path(preview_key, filename)
+        if not path:
+            return None
+
+        try:
+            with open(path, encoding='utf-8') as part_file:
+                return json.load(part_file)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Could not load preview {preview_key}: {str(e)}")
+            return None
@@ -0,0 +1,221 @@
+"""
+On-demand request profiling with a sampling profiler and tracemalloc
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Any, Optional, List
+
+
+class RequestProfiler:
+    """Class to sample the call stacks and memory of one request thread"""
+
+    # Only one profiled request at a time, tracemalloc is process-wide
+    _active_lock = threading.Lock()
+
+    def __init__(self, sample_interval: float = 0.005, top_allocations: int = 20, max_profiles: int = 50):
+        self.logger = logging.getLogger(__name__)
+        self.sample_interval = sample_interval
+        self.top_allocations = top_allocations
+        self.max_profiles = max_profiles
+
+        self._stacks = Counter()
+        self._stop_event = threading.Event()
+        self._sampler = None
+        self._target_thread = None
+        self._started_tracemalloc = False
+        self._start_time = 0.0
+        self._duration = 0.0
+        self._peak_memory = 0
+        self._allocations = []
+
+    def start(self) -> bool:
+        """
+        Start sampling the calling thread
+
+        Returns:
+            True if profiling started, False if another request is being profiled
+        """
+        if not self._active_lock.acquire(blocking=False):
+            self.logger.warning("Another request is being profiled, skipping profile")
+            return False
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        tracemalloc.reset_peak()
+
+        self._target_thread = threading.get_ident()
+        self._start_time = time.perf_counter()
+        self._stop_event.clear()
+        self._sampler = threading.Thread(target=self._sample_loop, name='request-profiler', daemon=True)
+        self._sampler.start()
+        return True
+
+    def stop(self) -> None:
+        """Stop sampling and take the memory snapshot"""
+        self._stop_event.set()
+        self._sampler.join()
+        self._duration = time.perf_counter() - self._start_time
+
+        try:
+            _, self._peak_memory = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            self._allocations = [
+                {'location': str(stat.traceback), 'size': stat.size, 'count': stat.count}
+                for stat in snapshot.statistics('lineno')[:self.top_allocations]
+            ]
+        finally:
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+            self._active_lock.release()
+
+    def save(self, profile_dir: str, tags: Dict[str, Any]) -> str:
+        """
+        Write the profile as folded stacks plus a JSON metadata file
+
+        The .folded file has one "frame;frame;frame count" line per stack and
+        can be fed to flamegraph.pl or opened in speedscope.
+
+        Args:
+            profile_dir: Directory where profiles are stored
+            tags: Extra metadata (e.g. rows and files processed)
+
+        Returns:
+            Profile name (file name without extension)
+        """
+        os.makedirs(profile_dir, exist_ok=True)
+        name = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+        with open(os.path.join(profile_dir, f'{name}.folded'), 'w', encoding='utf-8') as folded_file:
+            for stack, count in self._stacks.most_common():
+                folded_file.write(f'{stack} {count}\n')
+
+        metadata = {
+            'name': name,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'duration_seconds': round(self._duration, 3),
+            'samples': sum(self._stacks.values()),
+            'sample_interval': self.sample_interval,
+            'peak_memory_bytes': self._peak_memory,
+            'top_allocations': self._allocations,
+        }
+        metadata.update(tags)
+
+        with open(os.path.join(profile_dir, f'{name}.json'), 'w', encoding='utf-8') as meta_file:
+            json.dump(metadata, meta_file, ensure_ascii=False, indent=2)
+
+        self.logger.info(f"Saved profile {name} ({metadata['samples']} samples)")
+
+        removed = prune_profiles(profile_dir, self.max_profiles)
+        if removed:
+            self.logger.info(f"Removed {removed} old profiles")
+        return name
+
+    def _sample_loop(self) -> None:
+        """Record the target thread's stack every sample_interval seconds"""
+        while not self._stop_event.wait(self.sample_interval):
+            frame = sys._current_frames().get(self._target_thread)
+            if frame is None:
+                continue
+
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            stack.reverse()
+            self._stacks[';'.join(stack)] += 1
+
+
+def list_profiles(profile_dir: str) -> List[Dict[str, Any]]:
+    """
+    List saved profiles, newest first
+
+    Args:
+        profile_dir: Directory where profiles are stored
+
+    Returns:
+        List of profile metadata dictionaries (without allocation details)
+    """
+    if not os.path.isdir(profile_dir):
+        return []
+
+    profiles = []
+    for filename in os.listdir(profile_dir):
+        if not filename.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(profile_dir, filename), encoding='utf-8') as meta_file:
+                metadata = json.load(meta_file)
+        except (OSError, ValueError):
+            continue
+        metadata.pop('top_allocations', None)
+        profiles.append(metadata)
+
+    profiles.sort(key=lambda item: item.get('created_at', ''), reverse=True)
+    return profiles
+
+
+def prune_profiles(profile_dir: str, max_profiles: int) -> int:
+    """
+    Delete the oldest profiles so at most max_profiles remain
+
+    Age is taken from the files' modification time.
+
+    Args:
+        profile_dir: Directory where profiles are stored
+        max_profiles: Number of newest profiles to keep
+
+    Returns:
+        Number of profiles removed
+    """
+    if not os.path.isdir(profile_dir):
+        return 0
+
+    modified = {}
+    for entry in os.scandir(profile_dir):
+        name, extension = os.path.splitext(entry.name)
+        if extension in ('.folded', '.json'):
+            try:
+                modified[name] = max(modified.get(name, 0.0), entry.stat().st_mtime)
+            except FileNotFoundError:
+                continue
+
+    names = sorted(modified, key=lambda name: (modified[name], name))
+    expired = names[:max(0, len(names) - max_profiles)]
+
+    for name in expired:
+        for extension in ('folded', 'json'):
+            try:
+                os.remove(os.path.join(profile_dir, f'{name}.{extension}'))
+            except FileNotFoundError:
+                continue
+    return len(expired)
+
+
+def get_profile_path(profile_dir: str, name: str, extension: str) -> Optional[str]:
+    """
+    Resolve the path of a saved profile file
+
+    Args:
+        profile_dir: Directory where profiles are stored
+        name: Profile name as returned by RequestProfiler.save
+        extension: 'folded' or 'json'
+
+    Returns:
+        Path to the file or None if it does not exist
+    """
+    if extension not in ('folded', 'json') or os.path.basename(name) != name or name.startswith('.'):
+        return None
+
+    path = os.path.join(profile_dir, f'{name}.{extension}')
+    return path if os.path.isfile(path) else None
@@ -0,0 +1,171 @@
+"""
+Single-flight coalescing of identical jobs within and across worker processes
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Any, Optional, Callable, Iterable, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows, coalescing is then per process only
+    fcntl = None
+
+
+class _Call:
+    """One in-progress computation inside this process"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Class to run one computation per key and share its result with concurrent callers"""
+
+    def __init__(self, state_dir: str, result_ttl: float = 60.0, lock_timeout: float = 300.0,
+                 stale_after: float = 3600.0):
+        self.logger = logging.getLogger(__name__)
+        self.state_dir = state_dir
+        self.result_ttl = result_ttl
+        self.lock_timeout = lock_timeout
+        self.stale_after = stale_after
+
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+
+        os.makedirs(self.state_dir, exist_ok=True)
+
+    @staticmethod
+    def content_key(parts: Iterable[Tuple[str, bytes]], variant: str = '') -> str:
+        """
+        Build a key from named byte contents (e.g. uploaded file names and bytes)
+
+        Args:
+            parts: Sequence of (name, content) pairs, order matters
+            variant: Extra text for settings that change the output
+
+        Returns:
+            Hex SHA-256 digest
+        """
+        digest = hashlib.sha256(variant.encode('utf-8'))
+        for name, content in parts:
+            digest.update(b'\0' + name.encode('utf-8') + b'\0' + str(len(content)).encode() + b'\0')
+            digest.update(content)
+        return digest.hexdigest()
+
+    def do(self, key: str, compute: Callable[[], Optional[Dict[str, Any]]],
+           validate: Callable[[Dict[str, Any]], bool] = lambda result: True) -> Optional[Dict[str, Any]]:
+        """
+        Run compute once for all concurrent callers with the same key
+
+        Callers in this process wait on the first one. Across processes, the
+        first caller holds a file lock while computing and leaves its result
+        in a JSON file that waiting processes reuse for result_ttl seconds.
+
+        Args:
+            key: Key identifying identical work
+            compute: Function returning a JSON-serializable dict (or None on failure)
+            validate: Check that a shared result can still be used (e.g. file exists)
+
+        Returns:
+            The computed or shared result
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not is_leader:
+            self.logger.info(f"Waiting for in-flight job {key[:12]}")
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._do_locked(key, compute, validate)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def _do_locked(self, key: str, compute: Callable[[], Optional[Dict[str, Any]]],
+                   validate: Callable[[Dict[str, Any]], bool]) -> Optional[Dict[str, Any]]:
+        """Hold the key's file lock, reuse a fresh result or compute a new one"""
+        if fcntl is None:
+            return compute()
+
+        lock_path = os.path.join(self.state_dir, f'{key}.lock')
+        fd = os.open(lock_path, os.O_CREAT | os.O_RDWR, 0o644)
+        try:
+            locked = self._acquire(fd)
+            if not locked:
+                self.logger.warning(f"Timed out waiting for lock of job {key[:12]}, computing anyway")
+
+            shared = self._read_result(key)
+            if shared is not None and validate(shared):
+                self.logger.info(f"Reusing result of job {key[:12]} from another request")
+                return shared
+
+            os.utime(lock_path)
+            result = compute()
+            if result is not None:
+                self._write_result(key, result)
+            self._prune()
+            return result
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def _acquire(self, fd: int) -> bool:
+        """Take an exclusive lock on fd, polling until lock_timeout"""
+        deadline = time.monotonic() + self.lock_timeout
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    return False
+                time.sleep(0.05)
+
+    def _read_result(self, key: str) -> Optional[Dict[str, Any]]:
+        """Load a result written less than result_ttl seconds ago"""
+        path = os.path.join(self.state_dir, f'{key}.json')
+        try:
+            if time.time() - os.path.getmtime(path) > self.result_ttl:
+                return None
+            with open(path, encoding='utf-8') as result_file:
+                return json.load(result_file)
+        except (OSError, ValueError):
+            return None
+
+    def _write_result(self, key: str, result: Dict[str, Any]) -> None:
+        """Write the result atomically so readers never see a partial file"""
+        path = os.path.join(self.state_dir, f'{key}.json')
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as result_file:
+            json.dump(result, result_file)
+        os.replace(tmp_path, path)
+
+    def _prune(self) -> None:
+        """Remove result and lock files that have not been touched for stale_after seconds"""
+        now = time.time()
+        for entry in os.scandir(self.state_dir):
+            try:
+                if now - entry.stat().st_mtime > self.stale_after:
+                    os.remove(entry.path)
+            except OSError:
+                continue
@@ -2,25 +2,102 @@
 Word document processing utilities for filling templates with data
 """
 
+import copy
 import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from docx import Document
+from docx.oxml import OxmlElement, parse_xml
+from docx.oxml.ns import qn
 from docx.shared import Pt
-from typing import Dict, Any, List
+from docx.table import Table
+from lxml import etree
+from typing import Dict, Any, List, Optional
+
+from utils.calculations import format_brl
+
+# Process pool shared by all WordProcessor instances in this process, created on first use
+_render_pool = None
+_render_pool_workers = 0
+_render_pool_lock = threading.Lock()
+
+
+def _get_render_pool(workers: int) -> ProcessPoolExecutor:
+    """Return the shared process pool, recreating it if the worker count changed"""
+    global _render_pool, _render_pool_workers
+    with _render_pool_lock:
+        if _render_pool is None or _render_pool_workers != workers:
+            if _render_pool is not None:
+                _render_pool.shutdown(wait=False)
+            # Never fork: the request process already runs threads that may hold locks
+            _render_pool = ProcessPoolExecutor(max_workers=workers, mp_context=_render_pool_context())
+            _render_pool_workers = workers
+        return _render_pool
+
+
+def _render_pool_context():
+    """Start method for pool workers: forkserver where available, spawn otherwise"""
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context('spawn')
+
+
+def _render_row_fragments(shell_xml: str, base_rows: List[Optional[str]], prototype_xml: str,
+                          data_list: List[Dict[str, Any]]) -> List[str]:
+    """
+    Render table rows in a worker process and return their <w:tr> XML
+
+    Each row starts from its base XML (the template row it replaces, or the
+    prototype of a newly added row when None) and is filled exactly like the
+    serial path, so the fragments are identical to what it would produce.
+
+    Args:
+        shell_xml: The table element without rows (properties and grid only)
+        base_rows: Template row XML per data row, None for added rows
+        prototype_xml: XML of a row as created by Table.add_row
+        data_list: Calculated rows to render
+
+    Returns:
+        List of serialized <w:tr> elements, in order
+    """
+    shell = parse_xml(shell_xml)
+    for base_xml in base_rows:
+        shell.append(parse_xml(base_xml if base_xml is not None else prototype_xml))
+
+    table = Table(shell, None)
+    processor = WordProcessor()
+    fragments = []
+    for row, data in zip(table.rows, data_list):
+        processor._fill_row(row.cells, data)
+        fragments.append(etree.tostring(row._tr, encoding='unicode'))
+    return fragments
 
 class WordProcessor:
     """Class to handle Word document template processing"""
     
-    def __init__(self):
+    def __init__(self, parallel_workers: int = 0, parallel_min_rows: int = 2000):
         self.logger = logging.getLogger(__name__)
+        # Tables with at least parallel_min_rows rows are rendered by a process pool
+        self.parallel_workers = parallel_workers
+        self.parallel_min_rows = parallel_min_rows
     
-    def fill_template(self, template_path: str, data_list: List[Dict[str, Any]], output_path: str, worksheet_name: str = "Planilha") -> bool:
+    def fill_template(self, template_path: str, data_list: List[Dict[str, Any]], output_path: str, worksheet_name: str = "Planilha",
+                      rows_per_table: int = 0, split_by_month: bool = False, section_per_chunk: bool = False) -> bool:
         """
         Fill Word template with provided data from multiple rows
         
+        Large reports can be split into several tables, each one a copy of the
+        template table with its header row repeated on every page.
+        
         Args:
             template_path: Path to the Word template file
             data_list: List of dictionaries containing the data to fill
             output_path: Path where the filled document will be saved
+            worksheet_name: Text that replaces "ALTERE AQUI" in the document
+            rows_per_table: Maximum rows per table (0 = single table)
+            split_by_month: Start a new table whenever the month in 'data' changes
+            section_per_chunk: Put each table after the first in its own section
             
         Returns:
             True if successful, False otherwise
@@ -55,46 +132,244 @@ class WordProcessor:
                 self.logger.error("Table must have at least 11 columns")
                 return False
             
-            # Process each row of data
-            for i, data in enumerate(data_list):
-                # Calculate which row to fill (starting from row 2, index 1)
-                row_index = i + 1
-                
-                # Add more rows if needed
-                while len(table.rows) <= row_index:
-                    table.add_row()
-                
-                row = table.rows[row_index]
-                
-                # Map data to table columns with specific formatting and font sizes
-                # Column 3 has 40 character limit
-                nome_cliente = str(data.get('nome_cliente', '')).strip()[:40]
-                
-                self._fill_cell(row.cells[0], data.get('data'), 0)                    # Column 1 - Data (font 8)
-                self._fill_cell(row.cells[1], data.get('numero_pedido'), 1)           # Column 2 - Número do Pedido (font 8)
-                self._fill_cell(row.cells[2], nome_cliente, 2)                        # Column 3 - Nome do Cliente (font 9, max 40 chars)
-                self._fill_cell(row.cells[3], data.get('prazo'), 3)                   # Column 4 - Prazo (font 8)
-                self._fill_cell(row.cells[4], data.get('valor_pedido'), 4)            # Column 5 - Valor do Pedido (font 9)
-                self._fill_cell(row.cells[5], data.get('porcentagem'), 5)             # Column 6 - Porcentagem (font 8)
-                self._fill_cell(row.cells[6], data.get('valor_comissao'), 6)          # Column 7 - Valor da Comissão (font 9)
-                self._fill_cell(row.cells[7], data.get('frete'), 7)                   # Column 8 - Frete (font 8)
-                self._fill_cell(row.cells[8], data.get('referencia_comissao'), 8)     # Column 9 - Referência Comissão (font 9)
-                self._fill_cell(row.cells[9], data.get('pagamento'), 9)               # Column 10 - Pagamento (font 8)
+            chunks = self._split_chunks(data_list, rows_per_table, split_by_month)
+            
+            # Keep an untouched copy of the template table to clone for later chunks
+            table_prototype = copy.deepcopy(table._tbl) if len(chunks) > 1 else None
+            if table_prototype is not None:
+                self._repeat_header_row(table)
+            
+            self._fill_table(table, chunks[0])
+            if table_prototype is not None:
+                self._trim_table(table, len(chunks[0]))
+            
+            previous_element = table._tbl
+            for chunk in chunks[1:]:
+                separator = self._make_chunk_separator(doc, section_per_chunk)
+                previous_element.addnext(separator)
                 
-                # Column 11 can be left empty or filled with additional data if available
-                if len(row.cells) > 10:
-                    self._fill_cell(row.cells[10], "", 10)                            # Column 11 - Empty (font 8)
+                new_tbl = copy.deepcopy(table_prototype)
+                separator.addnext(new_tbl)
+                new_table = Table(new_tbl, table._parent)
+                self._repeat_header_row(new_table)
+                self._fill_table(new_table, chunk)
+                self._trim_table(new_table, len(chunk))
+                previous_element = new_tbl
             
             # Save the filled document
             doc.save(output_path)
             
-            self.logger.info(f"Successfully filled template with {len(data_list)} rows and saved to {output_path}")
+            self.logger.info(f"Successfully filled template with {len(data_list)} rows in {len(chunks)} tables and saved to {output_path}")
             return True
             
         except Exception as e:
             self.logger.error(f"Error filling Word template: {str(e)}")
             return False
     
+    def _fill_table(self, table, data_list: List[Dict[str, Any]]) -> None:
+        """
+        Fill the data rows of one table, adding rows as needed
+        
+        Args:
+            table: The table object (header in the first row)
+            data_list: List of dictionaries containing the data to fill
+        """
+        if self.parallel_workers > 1 and len(data_list) >= self.parallel_min_rows:
+            try:
+                self._fill_table_parallel(table, data_list)
+                return
+            except Exception as e:
+                self.logger.warning(f"Parallel rendering failed, rendering serially: {str(e)}")
+        
+        # Keep our own row list so each row lookup is O(1)
+        rows = list(table.rows)
+        
+        # Process each row of data
+        for i, data in enumerate(data_list):
+            # Calculate which row to fill (starting from row 2, index 1)
+            row_index = i + 1
+            
+            # Add more rows if needed
+            if row_index < len(rows):
+                row = rows[row_index]
+            else:
+                row = table.add_row()
+                rows.append(row)
+            
+            self._fill_row(row.cells, data)
+    
+    def _fill_table_parallel(self, table, data_list: List[Dict[str, Any]]) -> None:
+        """
+        Render the rows of one table in worker processes and stitch them in order
+        
+        The output is the same XML the serial path produces: every row is
+        rendered from the template row it replaces (or from the row
+        Table.add_row would create) and placed at the same position.
+        
+        Args:
+            table: The table object (header in the first row)
+            data_list: List of dictionaries containing the data to fill
+        """
+        tbl = table._tbl
+        
+        # Rows whose cells continue a vertical merge depend on the row above
+        if tbl.xpath('.//w:vMerge'):
+            raise ValueError("tables with vertically merged cells are rendered serially")
+        
+        existing_rows = list(tbl.tr_lst)[1:]
+        
+        # Capture a freshly added row exactly as the serial path would create it
+        prototype_tr = table.add_row()._tr
+        prototype_xml = etree.tostring(prototype_tr, encoding='unicode')
+        tbl.remove(prototype_tr)
+        
+        shell = copy.deepcopy(tbl)
+        for tr in shell.tr_lst:
+            shell.remove(tr)
+        shell_xml = etree.tostring(shell, encoding='unicode')
+        
+        base_rows = [
+            etree.tostring(existing_rows[i], encoding='unicode') if i < len(existing_rows) else None
+            for i in range(len(data_list))
+        ]
+        
+        chunk_size = -(-len(data_list) // (self.parallel_workers * 2))
+        pool = _get_render_pool(self.parallel_workers)
+        futures = [
+            pool.submit(_render_row_fragments, shell_xml, base_rows[start:start + chunk_size],
+                        prototype_xml, data_list[start:start + chunk_size])
+            for start in range(0, len(data_list), chunk_size)
+        ]
+        fragments = [fragment for future in futures for fragment in future.result()]
+        
+        # Stitch: replace template rows in place, append the rest
+        for i, fragment in enumerate(fragments):
+            new_tr = parse_xml(fragment)
+            if i < len(existing_rows):
+                tbl.replace(existing_rows[i], new_tr)
+            else:
+                tbl.append(new_tr)
+        
+        self.logger.info(f"Rendered {len(fragments)} rows in {len(futures)} chunks with {self.parallel_workers} processes")
+    
+    def _fill_row(self, cells, data: Dict[str, Any]) -> None:
+        """
+        Fill the cells of one table row with a calculated data row
+        
+        Args:
+            cells: Cells of the row
+            data: Dictionary containing the data to fill
+        """
+        # Map data to table columns with specific formatting and font sizes
+        # Column 3 has 40 character limit
+        nome_cliente = str(data.get('nome_cliente', '')).strip()[:40]
+        
+        self._fill_cell(cells[0], data.get('data'), 0)                    # Column 1 - Data (font 8)
+        self._fill_cell(cells[1], data.get('numero_pedido'), 1)           # Column 2 - Número do Pedido (font 8)
+        self._fill_cell(cells[2], nome_cliente, 2)                        # Column 3 - Nome do Cliente (font 9, max 40 chars)
+        self._fill_cell(cells[3], data.get('prazo'), 3)                   # Column 4 - Prazo (font 8)
+        self._fill_cell(cells[4], data.get('valor_pedido'), 4)            # Column 5 - Valor do Pedido (font 9)
+        self._fill_cell(cells[5], data.get('porcentagem'), 5)             # Column 6 - Porcentagem (font 8)
+        self._fill_cell(cells[6], data.get('valor_comissao'), 6)          # Column 7 - Valor da Comissão (font 9)
+        self._fill_cell(cells[7], data.get('frete'), 7)                   # Column 8 - Frete (font 8)
+        self._fill_cell(cells[8], data.get('referencia_comissao'), 8)     # Column 9 - Referência Comissão (font 9)
+        self._fill_cell(cells[9], data.get('pagamento'), 9)               # Column 10 - Pagamento (font 8)
+        
+        # Column 11 can be left empty or filled with additional data if available
+        if len(cells) > 10:
+            self._fill_cell(cells[10], "", 10)                            # Column 11 - Empty (font 8)
+    
+    def _split_chunks(self, data_list: List[Dict[str, Any]], rows_per_table: int, split_by_month: bool) -> List[List[Dict[str, Any]]]:
+        """
+        Split rows into consecutive chunks by month and/or by maximum size
+        
+        Args:
+            data_list: List of dictionaries containing the data to fill
+            rows_per_table: Maximum rows per chunk (0 = no limit)
+            split_by_month: Start a new chunk whenever the month in 'data' changes
+            
+        Returns:
+            List of chunks (always at least one, possibly empty)
+        """
+        groups = []
+        if split_by_month:
+            current_month = object()
+            for data in data_list:
+                month = self._month_key(data.get('data'))
+                if not groups or month != current_month:
+                    groups.append([])
+                    current_month = month
+                groups[-1].append(data)
+        else:
+            groups = [data_list]
+        
+        if rows_per_table <= 0:
+            return groups or [[]]
+        
+        chunks = []
+        for group in groups:
+            for start in range(0, len(group), rows_per_table):
+                chunks.append(group[start:start + rows_per_table])
+        
+        return chunks or [[]]
+    
+    def _month_key(self, date_value: Any) -> str:
+        """
+        Get the month part of a 'dd/mm' or 'dd/mm/YYYY' date string
+        
+        Args:
+            date_value: Date value from the calculated row
+            
+        Returns:
+            Month string (e.g. '05') or empty string if unknown
+        """
+        if date_value is None:
+            return ""
+        
+        parts = str(date_value).split('/')
+        return parts[1].strip() if len(parts) >= 2 else ""
+    
+    def _repeat_header_row(self, table) -> None:
+        """
+        Mark the first row of a table as a header repeated on each page
+        
+        Args:
+            table: The table object
+        """
+        tr_pr = table.rows[0]._tr.get_or_add_trPr()
+        if tr_pr.find(qn('w:tblHeader')) is None:
+            tr_pr.append(OxmlElement('w:tblHeader'))
+    
+    def _trim_table(self, table, used_rows: int) -> None:
+        """
+        Remove the template rows left blank after the filled rows of a chunk table
+        
+        Args:
+            table: The table object (header in the first row)
+            used_rows: Number of data rows filled in this table
+        """
+        tbl = table._tbl
+        for tr in list(tbl.tr_lst)[used_rows + 1:]:
+            tbl.remove(tr)
+    
+    def _make_chunk_separator(self, doc, section_per_chunk: bool):
+        """
+        Build the paragraph placed between two chunk tables
+        
+        Args:
+            doc: The document object
+            section_per_chunk: If True, the paragraph closes the current section
+            
+        Returns:
+            Paragraph XML element
+        """
+        paragraph = OxmlElement('w:p')
+        if section_per_chunk:
+            # A paragraph-level sectPr ends a section with the document's page setup
+            p_pr = paragraph.get_or_add_pPr()
+            p_pr.append(copy.deepcopy(doc.sections[-1]._sectPr))
+        return paragraph
+    
     def _fill_cell(self, cell, value: Any, column_index: int = 0) -> None:
         """
         Fill a table cell with the provided value and set font size
@@ -119,7 +394,7 @@ class WordProcessor:
                         elif column_index == 7:  # Frete column - format as integer (no % symbol)
                             formatted_value = f"{int(value)}"
                         else:  # Other numeric columns - format with 2 decimals, no R$
-                            formatted_value = f"{value:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
+                            formatted_value = format_brl(value)
                         cell.text = formatted_value
                     else:
                         # Other numeric columns - keep default formatting
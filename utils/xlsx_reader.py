@@ -0,0 +1,364 @@
+"""
+Minimal streaming .xlsx reader for the commission layout
+
+Reads cell values straight from the zip package with incremental XML
+parsing, skipping the style and cell objects openpyxl builds. It exposes the
+small part of the openpyxl read-only API that ExcelProcessor uses:
+workbook.active, worksheet.title, worksheet.iter_rows(values_only=True)
+and workbook.close().
+"""
+
+import posixpath
+import re
+import zipfile
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, List, Iterator, Tuple
+from xml.etree import ElementTree
+
+# Built-in number format ids that represent dates/times
+BUILTIN_DATE_FORMATS = set(range(14, 23)) | {45, 46, 47}
+
+# Parts of a number format that never mean a date: quoted text, [colors]/[locales], escaped chars
+FORMAT_NOISE_RE = re.compile(r'"[^"]*"|\[[^\]]*\]|\\.')
+DATE_TOKEN_RE = re.compile(r'[dmyhs]')
+CELL_REF_RE = re.compile(r'([A-Z]+)(\d+)')
+
+WINDOWS_EPOCH = datetime(1899, 12, 30)
+MAC_EPOCH = datetime(1904, 1, 1)
+
+RELATIONSHIP_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+
+
+def _local(tag: str) -> str:
+    """Strip the XML namespace from a tag"""
+    return tag.rsplit('}', 1)[-1]
+
+
+def column_index(letters: str) -> int:
+    """Convert column letters to a 1-based index (A -> 1, I -> 9, AA -> 27)"""
+    index = 0
+    for letter in letters:
+        index = index * 26 + (ord(letter) - 64)
+    return index
+
+
+def from_excel(serial: float, date1904: bool = False) -> datetime:
+    """
+    Convert an Excel date serial to datetime, like openpyxl.utils.datetime.from_excel
+
+    Args:
+        serial: Excel serial number
+        date1904: True if the workbook uses the 1904 date system
+
+    Returns:
+        Corresponding datetime
+    """
+    if date1904:
+        return MAC_EPOCH + timedelta(days=serial)
+
+    # Excel treats 1900 as a leap year; serials before the fake 29/02/1900 are off by one
+    if 0 < serial < 60:
+        serial += 1
+    return WINDOWS_EPOCH + timedelta(days=serial)
+
+
+class NativeXlsxWorkbook:
+    """Workbook opened directly from the .xlsx zip package"""
+
+    def __init__(self, file_path: str):
+        self._zip = zipfile.ZipFile(file_path)
+        self.date1904 = False
+        self._sheets: List[Tuple[str, str]] = []
+        self._active_index = 0
+        self._shared_strings: Optional[List[str]] = None
+        self._date_styles: Optional[List[bool]] = None
+        self._shared_strings_path: Optional[str] = None
+        self._styles_path: Optional[str] = None
+
+        self._read_workbook()
+
+    @property
+    def active(self) -> 'NativeXlsxSheet':
+        """The sheet selected when the workbook was last saved"""
+        index = self._active_index if self._active_index < len(self._sheets) else 0
+        title, path = self._sheets[index]
+        return NativeXlsxSheet(self, title, path)
+
+    def close(self) -> None:
+        """Close the underlying zip file"""
+        self._zip.close()
+
+    @property
+    def shared_strings(self) -> List[str]:
+        """Shared string table, loaded on first use"""
+        if self._shared_strings is None:
+            self._shared_strings = self._read_shared_strings()
+        return self._shared_strings
+
+    @property
+    def date_styles(self) -> List[bool]:
+        """For each cell style index, whether its number format is a date"""
+        if self._date_styles is None:
+            self._date_styles = self._read_date_styles()
+        return self._date_styles
+
+    def _read_workbook(self) -> None:
+        """Resolve sheet names, their XML paths, the shared strings and styles parts and the active sheet"""
+        workbook_path = self._workbook_path()
+        workbook_root = ElementTree.fromstring(self._zip.read(workbook_path))
+
+        relationships = self._read_relationships(workbook_path)
+        for rel_type, path in relationships.values():
+            if rel_type.endswith('/sharedStrings'):
+                self._shared_strings_path = path
+            elif rel_type.endswith('/styles'):
+                self._styles_path = path
+
+        for element in workbook_root.iter():
+            tag = _local(element.tag)
+            if tag == 'workbookPr':
+                self.date1904 = element.get('date1904') in ('1', 'true')
+            elif tag == 'workbookView':
+                self._active_index = int(element.get('activeTab', 0))
+            elif tag == 'sheet':
+                rel_id = element.get(f'{{{RELATIONSHIP_NS}}}id')
+                target = relationships.get(rel_id)
+                if target:
+                    self._sheets.append((element.get('name'), target[1]))
+
+        if not self._sheets:
+            raise ValueError("Workbook has no worksheets")
+
+    def _workbook_path(self) -> str:
+        """Find the main workbook part from the package relationships"""
+        root = ElementTree.fromstring(self._zip.read('_rels/.rels'))
+        for element in root:
+            if element.get('Type', '').endswith('/officeDocument'):
+                return element.get('Target').lstrip('/')
+        return 'xl/workbook.xml'
+
+    def _read_relationships(self, part_path: str) -> Dict[str, Tuple[str, str]]:
+        """Map relationship ids of a part to their type and absolute path inside the zip"""
+        base_dir = posixpath.dirname(part_path)
+        rels_path = posixpath.join(base_dir, '_rels', posixpath.basename(part_path) + '.rels')
+        if rels_path not in self._zip.namelist():
+            return {}
+
+        relationships = {}
+        for element in ElementTree.fromstring(self._zip.read(rels_path)):
+            target = element.get('Target', '')
+            if target.startswith('/'):
+                path = target.lstrip('/')
+            else:
+                path = posixpath.normpath(posixpath.join(base_dir, target))
+            relationships[element.get('Id')] = (element.get('Type', ''), path)
+        return relationships
+
+    def _read_shared_strings(self) -> List[str]:
+        """Read the shared string table incrementally (phonetic runs are ignored)"""
+        path = self._shared_strings_path
+        if path is None or path not in self._zip.namelist():
+            return []
+
+        strings = []
+        parts = []
+        skip_depth = 0
+        with self._zip.open(path) as stream:
+            for event, element in ElementTree.iterparse(stream, events=('start', 'end')):
+                tag = _local(element.tag)
+                if tag == 'rPh':
+                    skip_depth += 1 if event == 'start' else -1
+                elif event == 'end':
+                    if tag == 't' and not skip_depth:
+                        parts.append(element.text or '')
+                    elif tag == 'si':
+                        strings.append(''.join(parts))
+                        parts = []
+                        element.clear()
+        return strings
+
+    def _read_date_styles(self) -> List[bool]:
+        """Check each cellXfs entry's number format for date tokens"""
+        path = self._styles_path
+        if path is None or path not in self._zip.namelist():
+            return []
+
+        root = ElementTree.fromstring(self._zip.read(path))
+        custom_formats = {}
+        date_styles = []
+        for element in root:
+            tag = _local(element.tag)
+            if tag == 'numFmts':
+                for num_fmt in element:
+                    custom_formats[int(num_fmt.get('numFmtId'))] = num_fmt.get('formatCode', '')
+            elif tag == 'cellXfs':
+                for xf in element:
+                    fmt_id = int(xf.get('numFmtId', 0))
+                    if fmt_id in custom_formats:
+                        date_styles.append(self._is_date_format(custom_formats[fmt_id]))
+                    else:
+                        date_styles.append(fmt_id in BUILTIN_DATE_FORMATS)
+        return date_styles
+
+    @staticmethod
+    def _is_date_format(format_code: str) -> bool:
+        """Check whether a custom number format displays a date or time"""
+        cleaned = FORMAT_NOISE_RE.sub('', format_code).lower()
+        return bool(DATE_TOKEN_RE.search(cleaned))
+
+
+class NativeXlsxSheet:
+    """Worksheet whose rows are parsed on demand from the sheet XML"""
+
+    def __init__(self, workbook: NativeXlsxWorkbook, title: str, path: str):
+        self.workbook = workbook
+        self.title = title
+        self.path = path
+        self.max_column: Optional[int] = None
+
+    def xml_size(self) -> int:
+        """Uncompressed size of the sheet XML in bytes, read from the zip directory"""
+        return self.workbook._zip.getinfo(self.path).file_size
+
+    def read_dimension(self) -> Optional[str]:
+        """
+        Read the sheet's <dimension> reference (e.g. 'A1:L55') without parsing any rows
+
+        Returns:
+            Dimension reference, or None if the sheet has none
+        """
+        with self.workbook._zip.open(self.path) as stream:
+            for event, element in ElementTree.iterparse(stream, events=('start',)):
+                tag = _local(element.tag)
+                if tag == 'dimension':
+                    ref = element.get('ref')
+                    self.max_column = self._dimension_max_column(ref or '')
+                    return ref
+                if tag == 'sheetData':
+                    return None
+        return None
+
+    def iter_rows(self, min_row: int = 1, max_row: Optional[int] = None, max_col: Optional[int] = None,
+                  values_only: bool = True) -> Iterator[Tuple[Any, ...]]:
+        """
+        Yield row value tuples like openpyxl's read-only iter_rows(values_only=True)
+
+        Missing rows inside the range are yielded as empty rows and every
+        tuple is padded to max_col (or the sheet dimension when not given).
+
+        Args:
+            min_row: First row (1-based)
+            max_row: Last row, or None for the last row with data
+            max_col: Last column (1-based), cells to the right are skipped
+            values_only: Only value tuples are supported
+
+        Yields:
+            Tuple of cell values per row
+        """
+        if not values_only:
+            raise ValueError("NativeXlsxSheet only supports values_only=True")
+
+        shared_strings = self.workbook.shared_strings
+        date_styles = self.workbook.date_styles
+        date1904 = self.workbook.date1904
+
+        width = max_col
+        next_row = min_row
+        current_row = 0
+        row_values: Dict[int, Any] = {}
+        last_col = 0
+
+        with self.workbook._zip.open(self.path) as stream:
+            for event, element in ElementTree.iterparse(stream, events=('start', 'end')):
+                tag = _local(element.tag)
+
+                if event == 'start':
+                    if tag == 'row':
+                        current_row = int(element.get('r', current_row + 1))
+                        last_col = 0
+                    continue
+
+                if tag == 'c':
+                    ref = element.get('r')
+                    if ref:
+                        match = CELL_REF_RE.match(ref)
+                        col = column_index(match.group(1))
+                    else:
+                        col = last_col + 1
+                    last_col = col
+                    if (max_col is None or col <= max_col) and current_row >= min_row:
+                        value = self._cell_value(element, shared_strings, date_styles, date1904)
+                        if value is not None:
+                            row_values[col] = value
+
+                elif tag == 'row':
+                    element.clear()
+
+                    if current_row < min_row:
+                        row_values = {}
+                        continue
+                    if max_row is not None and current_row > max_row:
+                        break
+
+                    if width is None:
+                        width = self.max_column or 0
+
+                    # Fill rows that have no XML element
+                    while next_row < current_row:
+                        yield (None,) * width
+                        next_row += 1
+
+                    row_width = max(width, max(row_values) if row_values else 0)
+                    yield tuple(row_values.get(col) for col in range(1, row_width + 1))
+                    next_row = current_row + 1
+                    row_values = {}
+
+                elif tag == 'dimension':
+                    self.max_column = self._dimension_max_column(element.get('ref', ''))
+
+                elif tag == 'sheetData':
+                    break
+
+    def _cell_value(self, element, shared_strings: List[str], date_styles: List[bool], date1904: bool) -> Any:
+        """Convert one <c> element to a Python value"""
+        cell_type = element.get('t', 'n')
+        value_text = None
+        inline_parts = []
+        for child in element:
+            child_tag = _local(child.tag)
+            if child_tag == 'v':
+                value_text = child.text
+            elif child_tag == 'is':
+                inline_parts.extend(t.text or '' for t in child.iter() if _local(t.tag) == 't')
+
+        if cell_type == 'inlineStr':
+            return ''.join(inline_parts) if inline_parts else None
+        if value_text is None:
+            return None
+
+        if cell_type == 's':
+            return shared_strings[int(value_text)]
+        if cell_type == 'b':
+            return value_text == '1'
+        if cell_type in ('str', 'e'):
+            return value_text
+        if cell_type == 'd':
+            return datetime.fromisoformat(value_text)
+
+        # Numeric cell, same int/float rule as openpyxl
+        if '.' in value_text or 'E' in value_text or 'e' in value_text:
+            number = float(value_text)
+        else:
+            number = int(value_text)
+
+        style_index = int(element.get('s', 0))
+        if style_index < len(date_styles) and date_styles[style_index]:
+            return from_excel(number, date1904)
+        return number
+
+    @staticmethod
+    def _dimension_max_column(ref: str) -> Optional[int]:
+        """Last column of a dimension reference such as 'A1:L55'"""
+        last = ref.split(':')[-1]
+        match = CELL_REF_RE.match(last)
+        return column_index(match.group(1)) if match else None